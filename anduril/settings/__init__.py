@@ -58,10 +58,11 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'oidc_provider.middleware.SessionManagementMiddleware',
+    'lib.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'anduril.urls'
@@ -101,6 +102,109 @@ DATABASES = {
 }
 
 
+# Authentication backends
+# https://docs.djangoproject.com/en/1.11/topics/auth/customizing/#specifying-authentication-backends
+
+# Sessions logged in by the stock ModelBackend are moved to
+# ProfileModelBackend by core.middleware.AuthenticationMiddleware
+
+AUTHENTICATION_BACKENDS = [
+    'core.backends.ProfileModelBackend',
+]
+
+
+# Caching
+# https://docs.djangoproject.com/en/1.11/topics/cache/
+
+# Profile snapshots and validated access tokens are dropped from their
+# caches when a user or token changes, which only reaches every worker
+# if the cache is shared between them. The default local memory cache
+# is per process and only suits a single worker, such as runserver, so
+# deployments with more than one worker need a shared backend. Set one
+# with the ANDURIL_CACHE_BACKEND and ANDURIL_CACHE_LOCATION environment
+# variables, the location being a directory for the file based cache.
+# The file based cache counts its files on every write, so memcached is
+# the better choice for a school with more than a few thousand users.
+
+SHARED_CACHE_BACKEND = os.environ.get("ANDURIL_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache")
+SHARED_CACHE_LOCATION = os.environ.get("ANDURIL_CACHE_LOCATION", os.path.join(BASE_DIR, "cache"))
+
+# Entries a shared cache holds before culling, which should be above the
+# number of users so that a login storm doesn't evict snapshots or tokens
+
+SHARED_CACHE_MAX_ENTRIES = int(os.environ.get("ANDURIL_CACHE_MAX_ENTRIES", 10000))
+
+
+def shared_cache(name, timeout=300):
+    """Configure a cache that is shared by every worker."""
+
+    location = {
+        "django.core.cache.backends.locmem.LocMemCache": name,
+        "django.core.cache.backends.filebased.FileBasedCache": os.path.join(SHARED_CACHE_LOCATION, name),
+    }.get(SHARED_CACHE_BACKEND, SHARED_CACHE_LOCATION)
+    return {
+        'BACKEND': SHARED_CACHE_BACKEND,
+        'LOCATION': location,
+        'TIMEOUT': timeout,
+        'KEY_PREFIX': name,
+        'OPTIONS': {'MAX_ENTRIES': SHARED_CACHE_MAX_ENTRIES},
+    }
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'profiles': shared_cache('profiles'),
+    'tokens': shared_cache('tokens'),
+}
+
+
+# Login statistics
+# Seconds to buffer login counts in memory before writing them in bulk,
+# or None to write every login immediately
+
+LOGIN_STATISTICS_FLUSH_INTERVAL = None
+
+
+# Request profiling
+# Requests are profiled when enabled, for a sampled fraction, or when a
+# staff user sends the header. Profiles are dumped to the directory if
+# one is set, and timings are logged by lib.profiling.
+
+PROFILING_ENABLED = False
+PROFILING_SAMPLE_RATE = 0.0
+PROFILING_HEADER = "X-Profile"
+PROFILING_DIRECTORY = None
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'lib.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
+# Tests
+# Every test client request fails if the same query shape runs at
+# least NPLUSONE_THRESHOLD times; see lib/testing.py
+
+TEST_RUNNER = "lib.testing.NPlusOneTestRunner"
+
+NPLUSONE_THRESHOLD = 3
+NPLUSONE_RAISE = True
+
+
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
 
@@ -159,7 +263,7 @@ CORS_ORIGIN_ALLOW_ALL = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'oauth2_provider.contrib.rest_framework.OAuth2Authentication',
+        'api.authentication.CachedOAuth2Authentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -170,6 +274,14 @@ OAUTH2_PROVIDER = {
     "SCOPES": {"read": "Read scope", "write": "Write scope"}
 }
 
+# Seconds a validated access token is cached for, at most until it expires
+
+TOKEN_CACHE_TIMEOUT = 300
+
+# Most users that can be resolved in one batch lookup request
+
+API_LOOKUP_LIMIT = 500
+
 
 # OIDC Provider
 # http://django-oidc-provider.readthedocs.io/en/v0.5.x/sections/scopesclaims.html
@@ -1,33 +1,63 @@
 from oidc_provider.lib.claims import ScopeClaims
 
 from core.models import UserProfile
+from core import snapshots
+
+
+def claims(user) -> dict:
+    """Build the claims of every scope for a user.
+
+    Claims come from the user's profile snapshot, which is loaded with
+    the concrete profile in a single query and cached until the user or
+    profile is saved, so issuing tokens and serving userinfo usually
+    doesn't touch the database at all.
+    """
+
+    snapshot = snapshots.get(user)
+    if snapshot is None:
+        return {"profile": {}, "id": {}, "email": {"email": user.email}}
+
+    return {
+        "profile": {
+            "id": snapshot.id,
+            "username": snapshot.username,
+            "first_name": snapshot.user_first_name,
+            "last_name": snapshot.user_last_name,
+            "type": snapshot.type},
+        "id": {"student_id": snapshot.student_id} if snapshot.type == UserProfile.STUDENT else {},
+        "email": {"email": snapshot.email}}
 
 
 class CustomScopeClaims(ScopeClaims):
     """The scope claims for Anduril."""
 
+    @property
+    def claims(self):
+        """Get the claims of every scope, built once per instance."""
+
+        try:
+            return self._claims
+        except AttributeError:
+            self._claims = claims(self.user)
+            return self._claims
+
     info_profile = ("Profile information", "Username, name, and student or staff identification.")
 
     def scope_profile(self):
         """Populate the scope claim dictionary."""
 
-        return {"id": self.user.id,
-                "username": self.user.username,
-                "first_name": self.user.first_name,
-                "last_name": self.user.last_name,
-                "type": self.user.profile.type}
+        return self.claims["profile"]
 
     info_id = ("Student ID", "Student ID number, if applicable.")
 
     def scope_id(self):
         """Get student ID."""
 
-        if self.user.profile.type == UserProfile.STUDENT:
-            return {"student_id": self.user.profile.student_id}
+        return self.claims["id"]
 
     info_email = ("Email address", "Email address and verification.")
 
     def scope_email(self):
         """Get email information for a user."""
 
-        return {"email": self.user.email}
+        return self.claims["email"]
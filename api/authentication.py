@@ -0,0 +1,216 @@
+"""OAuth2 authentication with cached access tokens.
+
+Validating a bearer token normally loads the access token, its
+application, and its user from the database on every request. Since
+external services poll the API with the same token over and over, the
+validated token is cached by a hash of its value until it expires, or
+for TOKEN_CACHE_TIMEOUT seconds if that is sooner. Only the fields
+needed to authorize a request are cached, never the token itself or
+the user's password hash. Saving or deleting an access token, which is
+how tokens are revoked, drops it from the cache. Saving a user
+replaces a random version kept in the cache, which discards their
+cached tokens so permission changes apply immediately. A token is only
+served from the cache while its user's version is there, so a version
+that was culled is a miss rather than a reset. Revocation only reaches
+every worker if the tokens cache is shared between them through
+SHARED_CACHE_BACKEND.
+
+Hits and misses are counted in process and added to counters in the
+tokens cache every COUNT_FLUSH_INTERVAL requests, so counting doesn't
+touch the cache on every request.
+"""
+
+import collections
+import hashlib
+import threading
+import uuid
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.utils import timezone
+from oauth2_provider.contrib.rest_framework import OAuth2Authentication
+from oauth2_provider.models import AccessToken
+
+
+CACHE_ALIAS = getattr(settings, "TOKEN_CACHE", "tokens")
+KEY = "access-token:{}"
+USER_KEY = "token-user:{}"
+HITS = "token-cache:hits"
+MISSES = "token-cache:misses"
+
+# Fields of a validated token and its user that are cached, which are
+# enough to check expiry, scopes, and the usual permission classes
+TOKEN_FIELDS = ("id", "user_id", "application_id", "scope", "expires")
+USER_FIELDS = ("id", "is_active", "is_staff", "is_superuser")
+
+# Hits and misses counted before they are added to the shared counters
+COUNT_FLUSH_INTERVAL = 100
+
+lock = threading.Lock()
+pending = collections.Counter()
+
+
+def cache():
+    """Get the cache validated tokens are stored in."""
+
+    return caches[CACHE_ALIAS]
+
+
+@checks.register(checks.Tags.caches)
+def check_shared(app_configs, **kwargs) -> list:
+    """Warn when revoking a token would only reach one worker."""
+
+    backend = settings.CACHES.get(CACHE_ALIAS, {}).get("BACKEND", "")
+    if settings.DEBUG or not backend.endswith("LocMemCache"):
+        return []
+    return [checks.Warning(
+        "The tokens cache is local to each process, so other workers keep accepting a revoked token "
+        "until it expires from their cache.",
+        hint="Use a backend shared by every worker with ANDURIL_CACHE_BACKEND.",
+        id="api.W001")]
+
+
+def key(token: str) -> str:
+    """Get the cache key of a token without storing the token itself."""
+
+    return KEY.format(hashlib.sha256(token.encode()).hexdigest())
+
+
+def dump(access_token) -> dict:
+    """Get the cached fields of a validated token and its user."""
+
+    fields = {name: getattr(access_token, name) for name in TOKEN_FIELDS}
+    if access_token.user_id is not None:
+        fields["user"] = {name: getattr(access_token.user, name) for name in USER_FIELDS}
+    return fields
+
+
+def build(model, fields):
+    """Build an instance from some of its fields, deferring the rest."""
+
+    names = [field.attname for field in model._meta.concrete_fields if field.attname in fields]
+    return model.from_db(None, names, [fields[name] for name in names])
+
+
+def load(token: str, fields: dict):
+    """Rebuild a validated token and its user from their cached fields.
+
+    Fields that aren't cached are loaded from the database if they are
+    ever accessed.
+    """
+
+    fields = dict(fields)
+    user = fields.pop("user", None)
+    access_token = build(AccessToken, fields)
+    access_token.token = token
+    access_token.user = build(AccessToken._meta.get_field("user").related_model, user) if user else None
+    return access_token
+
+
+def count(name: str):
+    """Count a hit or miss, adding to the shared counters now and then."""
+
+    with lock:
+        pending[name] += 1
+        if sum(pending.values()) < COUNT_FLUSH_INTERVAL:
+            return
+    flush()
+
+
+def flush():
+    """Add the hits and misses counted in process to the shared counters."""
+
+    with lock:
+        counts = dict(pending)
+        pending.clear()
+    for name, value in counts.items():
+        cache().add(name, 0, timeout=None)
+        try:
+            cache().incr(name, value)
+        except ValueError:
+            pass
+
+
+def stats() -> dict:
+    """Get the approximate hit and miss counts of this cache."""
+
+    flush()
+    counts = cache().get_many((HITS, MISSES))
+    return {"hits": counts.get(HITS, 0), "misses": counts.get(MISSES, 0)}
+
+
+def reset():
+    """Reset the hit and miss counts."""
+
+    with lock:
+        pending.clear()
+    cache().delete_many((HITS, MISSES))
+
+
+def invalidate(*tokens):
+    """Drop tokens from the cache."""
+
+    cache().delete_many([key(token) for token in tokens])
+
+
+def user_version(user_id) -> str:
+    """Get the version of a user's cached tokens, starting one if missing.
+
+    Versions are random so that a version that was culled or expired
+    is never issued again, which would make tokens cached under it
+    valid again.
+    """
+
+    name = USER_KEY.format(user_id)
+    version = cache().get(name)
+    if version is None:
+        cache().add(name, uuid.uuid4().hex, timeout=None)
+        version = cache().get(name)
+    return version
+
+
+def invalidate_user(user_id):
+    """Discard every cached token of a user."""
+
+    cache().set(USER_KEY.format(user_id), uuid.uuid4().hex, timeout=None)
+
+
+def bearer(request):
+    """Get the bearer token from the authorization header if there is one."""
+
+    parts = request.META.get("HTTP_AUTHORIZATION", "").split()
+    if len(parts) == 2 and parts[0].lower() == "bearer":
+        return parts[1]
+    return None
+
+
+class CachedOAuth2Authentication(OAuth2Authentication):
+    """OAuth2 authentication that skips the database for cached tokens."""
+
+    def authenticate(self, request):
+        """Authenticate from the cache, or validate and cache the token."""
+
+        token = bearer(request)
+        if token is None:
+            return super().authenticate(request)
+
+        cached = cache().get(key(token))
+        if cached is not None:
+            fields, version = cached
+            access_token = load(token, fields)
+            current = cache().get(USER_KEY.format(access_token.user_id))
+            if not access_token.is_expired() and current is not None and version == current:
+                count(HITS)
+                return access_token.user, access_token
+
+        count(MISSES)
+        result = super().authenticate(request)
+        if result is not None:
+            access_token = result[1]
+            timeout = min(
+                getattr(settings, "TOKEN_CACHE_TIMEOUT", 300),
+                (access_token.expires - timezone.now()).total_seconds())
+            if timeout > 0:
+                cache().set(key(token), (dump(access_token), user_version(access_token.user_id)), int(timeout))
+        return result
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from api import authentication
+
+
+class Command(BaseCommand):
+    """Reports how often API tokens are served from the cache."""
+
+    help = """\
+    This command prints the hit and miss counts of the access token
+    cache. Each worker counts in process and adds its counts to shared
+    counters in the tokens cache every hundred or so requests, so the
+    totals are approximate. With a per process cache the counters only
+    cover the process that reads them, so read them from a serving
+    worker at /api/tokens/stats/ instead.
+    """
+
+    def add_arguments(self, parser):
+        """Add arguments to the parser."""
+
+        parser.add_argument("--reset", dest="reset", action="store_true", help="Reset the counters afterwards.")
+
+    def handle(self, *args, reset=False, **kwargs):
+        """Run the actual command."""
+
+        stats = authentication.stats()
+        total = stats["hits"] + stats["misses"]
+        ratio = stats["hits"] / total if total else 0
+        self.stdout.write(f"{stats['hits']} hits, {stats['misses']} misses ({ratio:.1%} hit rate)")
+        if reset:
+            authentication.reset()
@@ -1,3 +1,27 @@
-from django.db import models
+from django.contrib.auth import models as auth
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from oauth2_provider.models import AccessToken
 
-# Create your models here.
+from core.models import User
+from . import authentication
+
+
+@receiver(post_save, sender=AccessToken)
+@receiver(post_delete, sender=AccessToken)
+def on_change_access_token(sender, instance, **kwargs):
+    """Drop a saved, revoked, or deleted token from the token cache."""
+
+    authentication.invalidate(instance.token)
+
+
+def on_change_user(sender, instance, update_fields=None, **kwargs):
+    """Discard the cached tokens of a user whose access may have changed."""
+
+    if update_fields is None or {"is_active", "is_staff", "is_superuser", "password"} & set(update_fields):
+        authentication.invalidate_user(instance.pk)
+
+
+for model in (auth.User, User):
+    post_save.connect(on_change_user, sender=model)
+    post_delete.connect(on_change_user, sender=model)
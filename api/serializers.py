@@ -3,13 +3,46 @@
 from rest_framework import serializers
 
 from core import models
+from groups import models as group_models
 
 
-class UserSerializer(serializers.ModelSerializer):
-    """Serializes user models."""
+class SparseFieldsMixin:
+    """Serializer that only includes the fields it is asked for.
 
-    profile_type = serializers.CharField(source="profile.type")
+    Pass fields=None for every field. Unknown field names raise a
+    validation error.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        """Drop the fields that were not requested."""
+
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            unknown = set(fields) - set(self.fields)
+            if unknown:
+                raise serializers.ValidationError({"fields": f"Unknown fields: {', '.join(sorted(unknown))}"})
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class UserSerializer(SparseFieldsMixin, serializers.Serializer):
+    """Serializes the cached snapshot of a user and their profile."""
+
+    id = serializers.IntegerField()
+    username = serializers.CharField()
+    email = serializers.CharField()
+    first_name = serializers.CharField(source="user_first_name")
+    last_name = serializers.CharField(source="user_last_name")
+    display_name = serializers.CharField(source="full_name")
+    profile_type = serializers.CharField(source="type")
+    student_id = serializers.CharField(allow_null=True)
+
+
+class GroupSerializer(serializers.ModelSerializer):
+    """Serializes groups annotated with their type."""
+
+    type = serializers.CharField(read_only=True)
 
     class Meta:
-        model = models.User
-        fields = ("username", "email", "first_name", "last_name", "profile_type", )
+        model = group_models.Group
+        fields = ("id", "name", "title", "description", "type", "hidden")
@@ -5,4 +5,8 @@ from . import views
 
 urls = [
     url("user/$", views.UserView.as_view()),
+    url("users/lookup/$", views.UserLookupView.as_view()),
+    url("users/export\.(?P<kind>csv|ndjson)$", views.UserExportView.as_view()),
+    url("groups/$", views.GroupDirectoryView.as_view()),
+    url("tokens/stats/$", views.TokenCacheStatsView.as_view()),
 ]
@@ -1,3 +1,293 @@
-from django.test import TestCase
+import datetime
+import json
 
-# Create your tests here.
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from oauth2_provider.models import AccessToken, Application
+
+from core.models import User, UserProfile
+from core import snapshots
+from lib import testing
+from api import authentication
+
+
+class UserViewTest(TestCase):
+    """Check field selection and conditional requests on the user endpoint."""
+
+    def setUp(self):
+        """Create a student with a read token."""
+
+        snapshots.cache().clear()
+        self.user = User.objects.create_user(
+            username="student",
+            email="student@example.com",
+            first_name="Sean",
+            last_name="Gabaree",
+            type=UserProfile.STUDENT,
+            profile__student_id="123456")
+        application = Application.objects.create(
+            name="test",
+            client_type=Application.CLIENT_CONFIDENTIAL,
+            authorization_grant_type=Application.GRANT_CLIENT_CREDENTIALS)
+        self.token = AccessToken.objects.create(
+            user=self.user,
+            application=application,
+            token="token",
+            scope="read",
+            expires=timezone.now() + datetime.timedelta(hours=1))
+
+    def get(self, path="/api/user/", **headers):
+        """Make an authenticated request."""
+
+        return self.client.get(path, HTTP_AUTHORIZATION=f"Bearer {self.token.token}", **headers)
+
+    def test_fields(self):
+        """Only the requested fields are returned."""
+
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["profile_type"], UserProfile.STUDENT)
+        self.assertEqual(response.data["username"], "student")
+        response = self.get("/api/user/?fields=username,profile_type")
+        self.assertEqual(response.data, {"username": "student", "profile_type": UserProfile.STUDENT})
+        self.assertEqual(self.get("/api/user/?fields=password").status_code, 400)
+
+    def test_not_modified(self):
+        """Revalidating returns 304 without touching profile tables."""
+
+        etag = self.get()["ETag"]
+        # The token, its user, and the snapshot are all cached
+        with self.assertNumQueries(0):
+            response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotEqual(self.get("/api/user/?fields=username")["ETag"], etag)
+
+        self.user.profile.display_first_name = "Shawn"
+        self.user.profile.save()
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class UserLookupViewTest(TestCase):
+    """Check that batch lookups resolve users in one query."""
+
+    def setUp(self):
+        """Create a mix of users and a read token."""
+
+        self.students = [
+            User.objects.create_user(username=f"student{i}", type=UserProfile.STUDENT, profile__student_id=str(i))
+            for i in range(20)]
+        self.teacher = User.objects.create_user(
+            username="teacher", first_name="Ada", last_name="Lovelace", type=UserProfile.TEACHER)
+        application = Application.objects.create(
+            name="test",
+            client_type=Application.CLIENT_CONFIDENTIAL,
+            authorization_grant_type=Application.GRANT_CLIENT_CREDENTIALS)
+        self.token = AccessToken.objects.create(
+            user=self.teacher,
+            application=application,
+            token="token",
+            scope="read",
+            expires=timezone.now() + datetime.timedelta(hours=1))
+
+    def post(self, data, path="/api/users/lookup/"):
+        """Make an authenticated lookup."""
+
+        return self.client.post(
+            path, data, content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {self.token.token}")
+
+    def test_lookup(self):
+        """Users are found by any key with the token lookup and one more query."""
+
+        data = {
+            "usernames": [f"student{i}" for i in range(10)] + ["nobody"],
+            "ids": [self.teacher.id],
+            "student_ids": [str(i) for i in range(5, 15)] + ["999"]}
+        with self.assertNumQueries(2):
+            response = self.post(json.dumps(data))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 16)
+        self.assertEqual(response.data["missing"], {"usernames": ["nobody"], "ids": [], "student_ids": ["999"]})
+        teacher, = [user for user in response.data["results"] if user["username"] == "teacher"]
+        self.assertEqual(teacher["profile_type"], UserProfile.TEACHER)
+        self.assertEqual(teacher["display_name"], "Ada Lovelace")
+
+    @override_settings(API_LOOKUP_LIMIT=5)
+    def test_limit(self):
+        """Lookups over the limit or with bad values are rejected."""
+
+        self.assertEqual(self.post(json.dumps({"usernames": [f"student{i}" for i in range(6)]})).status_code, 400)
+        self.assertEqual(self.post(json.dumps({"ids": ["x"]})).status_code, 400)
+        response = self.post(json.dumps({"ids": [self.students[0].id]}), "/api/users/lookup/?fields=username")
+        self.assertEqual(response.data["results"], [{"username": "student0"}])
+
+
+class UserExportViewTest(TestCase):
+    """Check that the export streams every profile type."""
+
+    def setUp(self):
+        """Create users of a few types and a staff token."""
+
+        User.objects.create_user(username="student", type=UserProfile.STUDENT, profile__student_id="1")
+        User.objects.create_user(username="staff", type=UserProfile.STAFF, profile__title="Registrar")
+        self.admin = User.objects.create_user(username="admin", type=UserProfile.TEACHER, is_staff=True)
+        application = Application.objects.create(
+            name="test",
+            client_type=Application.CLIENT_CONFIDENTIAL,
+            authorization_grant_type=Application.GRANT_CLIENT_CREDENTIALS)
+        self.token = AccessToken.objects.create(
+            user=self.admin,
+            application=application,
+            token="token",
+            scope="read",
+            expires=timezone.now() + datetime.timedelta(hours=1))
+
+    def get(self, path):
+        """Make an authenticated request."""
+
+        return self.client.get(path, HTTP_AUTHORIZATION=f"Bearer {self.token.token}")
+
+    def test_ndjson(self):
+        """Each user is one JSON line with type specific fields."""
+
+        response = self.get("/api/users/export.ndjson")
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row["username"] for row in rows], ["student", "staff", "admin"])
+        self.assertEqual(rows[0]["student_id"], "1")
+        self.assertEqual(rows[1]["title"], "Registrar")
+        self.assertIsNone(rows[1]["student_id"])
+
+    def test_csv(self):
+        """The CSV has a header and a line per user, and needs staff."""
+
+        lines = b"".join(self.get("/api/users/export.csv").streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith("id,username"))
+        self.admin.is_staff = False
+        self.admin.save()
+        self.assertEqual(self.get("/api/users/export.csv").status_code, 403)
+
+
+class TokenCacheTest(TestCase):
+    """Check that validated tokens are cached until revoked."""
+
+    def setUp(self):
+        """Create a user with a read token."""
+
+        authentication.cache().clear()
+        authentication.reset()
+        snapshots.cache().clear()
+        self.user = User.objects.create_user(username="student", type=UserProfile.STUDENT, profile__student_id="1")
+        self.application = Application.objects.create(
+            name="test",
+            client_type=Application.CLIENT_CONFIDENTIAL,
+            authorization_grant_type=Application.GRANT_CLIENT_CREDENTIALS)
+        self.token = AccessToken.objects.create(
+            user=self.user,
+            application=self.application,
+            token="token",
+            scope="read",
+            expires=timezone.now() + datetime.timedelta(hours=1))
+
+    def get(self):
+        """Make an authenticated request."""
+
+        return self.client.get("/api/user/", HTTP_AUTHORIZATION=f"Bearer {self.token.token}")
+
+    def test_cached(self):
+        """Repeated requests with a token don't query the database."""
+
+        self.assertEqual(self.get().status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get().status_code, 200)
+        self.assertEqual(authentication.stats(), {"hits": 1, "misses": 1})
+
+    def test_cached_fields(self):
+        """Tokens are rebuilt from cached fields without the token or password hash."""
+
+        self.user.set_password("secret")
+        self.user.save()
+        self.get()
+        cached = repr(authentication.cache().get(authentication.key(self.token.token)))
+        self.assertNotIn(repr(self.token.token), cached)
+        self.assertNotIn(self.user.password, cached)
+        request = RequestFactory().get("/api/user/", HTTP_AUTHORIZATION=f"Bearer {self.token.token}")
+        with self.assertNumQueries(0):
+            user, access_token = authentication.CachedOAuth2Authentication().authenticate(request)
+            self.assertEqual((user.pk, user.is_staff), (self.user.pk, False))
+            self.assertEqual(access_token.token, self.token.token)
+            self.assertTrue(access_token.is_valid(["read"]))
+        self.assertEqual(user.username, "student")
+
+    def test_counted_in_process(self):
+        """Hits and misses only reach the shared counters every so often."""
+
+        for _ in range(5):
+            self.get()
+        self.assertIsNone(authentication.cache().get(authentication.HITS))
+        self.assertEqual(authentication.stats(), {"hits": 4, "misses": 1})
+
+    def test_revoke(self):
+        """Revoked tokens stop authenticating immediately."""
+
+        self.get()
+        self.token.revoke()
+        self.assertEqual(self.get().status_code, 401)
+
+    def test_user_change(self):
+        """Saving the user discards their cached tokens."""
+
+        self.get()
+        self.user.first_name = "Sean"
+        self.user.save()
+        self.get()
+        self.assertEqual(authentication.stats(), {"hits": 0, "misses": 2})
+
+    def test_culled_version(self):
+        """Tokens whose user version was culled are validated again."""
+
+        self.get()
+        authentication.cache().delete(authentication.USER_KEY.format(self.user.pk))
+        self.get()
+        self.get()
+        self.assertEqual(authentication.stats(), {"hits": 1, "misses": 2})
+
+    def test_revoke_across_workers(self):
+        """A token revoked by another worker stops authenticating here."""
+
+        with testing.shared_caches(authentication.CACHE_ALIAS) as env:
+            self.assertEqual(self.get().status_code, 200)
+            AccessToken.objects.filter(pk=self.token.pk).update(expires=timezone.now())
+            testing.run_worker("from api import authentication\nauthentication.invalidate('token')", env)
+            self.assertEqual(self.get().status_code, 401)
+
+    def test_user_change_across_workers(self):
+        """A user saved by another worker has their tokens validated again."""
+
+        with testing.shared_caches(authentication.CACHE_ALIAS) as env:
+            self.get()
+            testing.run_worker(f"from api import authentication\nauthentication.invalidate_user({self.user.pk})", env)
+            self.get()
+            self.assertEqual(authentication.stats(), {"hits": 0, "misses": 2})
+
+    def test_stats_view(self):
+        """Staff can read the counters of the serving worker."""
+
+        self.get()
+        self.get()
+        response = self.client.get("/api/tokens/stats/", HTTP_AUTHORIZATION="Bearer token")
+        self.assertEqual(response.status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get("/api/tokens/stats/", HTTP_AUTHORIZATION="Bearer token")
+        self.assertEqual(response.json(), {"hits": 2, "misses": 2})
+
+    def test_expiry(self):
+        """Tokens are not cached past their expiry."""
+
+        self.token.expires = timezone.now() - datetime.timedelta(seconds=1)
+        self.token.save()
+        self.assertEqual(self.get().status_code, 401)
+        self.assertIsNone(authentication.cache().get(authentication.key("token")))
@@ -1,11 +1,18 @@
-from oauth2_provider.contrib.rest_framework import OAuth2Authentication
+from django.conf import settings
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils.http import parse_etags, quote_etag
 from oauth2_provider.contrib.rest_framework.permissions import TokenHasReadWriteScope, TokenHasScope
-from rest_framework import views
+from rest_framework import exceptions, permissions, status, views
 from rest_framework.response import Response
 from rest_framework.decorators import detail_route
 
-from core import models
-from . import serializers
+import hashlib
+
+from core import export, models, snapshots
+from groups import directory
+from .authentication import CachedOAuth2Authentication
+from . import authentication, serializers
 
 
 class UserView(views.APIView):
@@ -13,12 +20,122 @@ class UserView(views.APIView):
 
     queryset = models.User.objects
 
-    authentication_classes = (OAuth2Authentication,)
+    authentication_classes = (CachedOAuth2Authentication,)
+    permission_classes = (TokenHasScope,)
+    required_scopes = ("read",)
+
+    def get(self, request, format=None):
+        """Get the user's information, or 304 if the client's copy is current.
+
+        Everything comes from the profile snapshot, so revalidating a
+        cached response costs no profile queries or serialization.
+        """
+
+        snapshot = snapshots.get(request.user)
+        if snapshot is None:
+            raise exceptions.NotFound("User has no profile.")
+
+        fields = request.query_params.get("fields")
+        fields = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+        etag = quote_etag(hashlib.sha1(repr((tuple(snapshot), fields)).encode()).hexdigest())
+        if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        data = serializers.UserSerializer(snapshot, fields=fields).data
+        return Response(data, headers={"ETag": etag})
+
+
+class UserLookupView(views.APIView):
+    """Resolve many users at once by username, ID, or student ID."""
+
+    authentication_classes = (CachedOAuth2Authentication,)
+    permission_classes = (TokenHasScope,)
+    required_scopes = ("read",)
+
+    # Request keys and the user lookups they map to
+    keys = {
+        "usernames": ("username", str),
+        "ids": ("id", int),
+        "student_ids": ("profile__studentuserprofile__student_id", str)}
+
+    def post(self, request, format=None):
+        """Get the users matching any of the given keys in one query.
+
+        The body has lists of usernames, ids, and student_ids. Users are
+        returned with their profile type and display name, and keys
+        that did not match anyone are listed under missing.
+        """
+
+        limit = getattr(settings, "API_LOOKUP_LIMIT", 500)
+        values = {}
+        for key, (lookup, kind) in self.keys.items():
+            given = request.data.get(key) or []
+            if not isinstance(given, list):
+                raise exceptions.ValidationError({key: "Expected a list."})
+            try:
+                values[key] = {kind(value) for value in given}
+            except (TypeError, ValueError):
+                raise exceptions.ValidationError({key: "Invalid value."})
+        if sum(map(len, values.values())) > limit:
+            raise exceptions.ValidationError(f"At most {limit} users can be looked up at once.")
+
+        query = Q()
+        for key, (lookup, kind) in self.keys.items():
+            if values[key]:
+                query |= Q(**{f"{lookup}__in": values[key]})
+        users = list(models.User.objects.with_profile().filter(query)) if query else []
+
+        found = [snapshot for snapshot in map(snapshots.build, users) if snapshot is not None]
+        fields = request.query_params.get("fields")
+        fields = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+        return Response({
+            "results": serializers.UserSerializer(found, many=True, fields=fields).data,
+            "missing": {
+                "usernames": sorted(values["usernames"] - {snapshot.username for snapshot in found}),
+                "ids": sorted(values["ids"] - {snapshot.id for snapshot in found}),
+                "student_ids": sorted(values["student_ids"] - {snapshot.student_id for snapshot in found})}})
+
+
+class UserExportView(views.APIView):
+    """Stream every user and profile as CSV or NDJSON."""
+
+    authentication_classes = (CachedOAuth2Authentication,)
+    permission_classes = (TokenHasScope, permissions.IsAdminUser)
+    required_scopes = ("read",)
+
+    content_types = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+    def get(self, request, kind="ndjson", format=None):
+        """Stream the export without building it in memory."""
+
+        response = StreamingHttpResponse(export.lines(kind), content_type=self.content_types[kind])
+        response["Content-Disposition"] = f'attachment; filename="users.{kind}"'
+        return response
+
+
+class GroupDirectoryView(views.APIView):
+    """Search and page through the group directory."""
+
+    authentication_classes = (CachedOAuth2Authentication,)
     permission_classes = (TokenHasScope,)
     required_scopes = ("read",)
 
     def get(self, request, format=None):
-        """Get the user view."""
+        """Get a page of groups and the cursor of the next page."""
+
+        page = directory.from_params(request.query_params, request.user)
+        return Response({
+            "results": serializers.GroupSerializer(page.groups, many=True).data,
+            "next": page.next})
+
+
+class TokenCacheStatsView(views.APIView):
+    """Report how often access tokens are served from the cache."""
+
+    authentication_classes = (CachedOAuth2Authentication,)
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request, format=None):
+        """Get the hit and miss counts of the serving workers."""
 
-        print(request.user)
-        return Response({})
+        return Response(authentication.stats())
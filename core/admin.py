@@ -11,6 +11,9 @@ from django import forms
 from django.contrib.auth import forms as auth_forms
 from django.contrib.auth import validators as auth_validators
 from django.contrib.auth.models import User, Permission
+from django.db.models import F, Q
+from lib.pagination import EstimatedCountPaginator
+from lib.polymorphic import content_type_ids
 from . import models
 from . import rules
 
@@ -86,10 +89,7 @@ class UserCreationForm(auth_forms.UserCreationForm):
         if not username:
             if not first_name or not last_name:
                 raise forms.ValidationError("Username generation requires first and last name.")
-            username_generator = rules.generate_username(first_name, last_name)
-            username = next(username_generator)
-            while models.User.objects.filter(username=username).exists():
-                username = next(username_generator)
+            username, = rules.allocate_usernames([(first_name, last_name)])
         return username
 
     class Meta:
@@ -97,6 +97,57 @@ class UserCreationForm(auth_forms.UserCreationForm):
         fields = ("email", "first_name", "last_name")
 
 
+class ProfileTypeFilter(admin.SimpleListFilter):
+    """Filter users by the content type of their profile."""
+
+    title = "profile type"
+    parameter_name = "type"
+
+    def lookups(self, request, model_admin):
+        """List every profile type."""
+
+        return [(type, type.capitalize()) for type in models.UserProfile.TYPES]
+
+    def queryset(self, request, queryset):
+        """Filter on the indexed profile content type."""
+
+        if self.value() not in models.UserProfile.concrete:
+            return queryset
+        ctype_id = content_type_ids(models.UserProfile.concrete)[self.value()]
+        return queryset.filter(profile__polymorphic_ctype_id=ctype_id)
+
+
+class GraduationYearFilter(admin.SimpleListFilter):
+    """Filter students and alumni by graduation year."""
+
+    title = "graduation year"
+    parameter_name = "graduation_year"
+    profiles = (models.StudentUserProfile, models.AlumnusUserProfile)
+
+    def lookups(self, request, model_admin):
+        """List the graduation years in use, newest first."""
+
+        years = set()
+        for profile in self.profiles:
+            years.update(profile.objects
+                         .exclude(graduation_year=None)
+                         .order_by()
+                         .values_list("graduation_year", flat=True)
+                         .distinct())
+        return [(str(year), str(year)) for year in sorted(years, reverse=True)]
+
+    def queryset(self, request, queryset):
+        """Match profiles by their indexed graduation year."""
+
+        if not self.value() or not self.value().isdigit():
+            return queryset
+        year = int(self.value())
+        matches = Q()
+        for profile in self.profiles:
+            matches |= Q(profile__in=profile.objects.filter(graduation_year=year).values("pk"))
+        return queryset.filter(matches)
+
+
 class UserAdmin(polymorphic_admin.PolymorphicInlineSupportMixin, auth_admin.UserAdmin):
     """Superclass user profile admin interface."""
 
@@ -106,12 +157,24 @@ class UserAdmin(polymorphic_admin.PolymorphicInlineSupportMixin, auth_admin.User
     inlines = (UserProfileInline,)
 
     list_display = ('username', 'type', 'first_name', 'last_name', 'email', 'is_staff')
-    list_filter = ('is_staff', 'is_superuser', 'is_active', 'groups')
+    list_filter = (ProfileTypeFilter, GraduationYearFilter, 'is_staff', 'is_superuser', 'is_active', 'groups')
+
+    # Skip counting the whole table under filtered results
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        """Annotate profile content types rather than fetching each profile."""
+
+        return super().get_queryset(request).annotate(profile_ctype_id=F("profile__polymorphic_ctype"))
 
     def type(self, obj: models.User):
         """Return the type of user."""
 
-        return obj.profile.type.capitalize()
+        types = {id: type for type, id in content_type_ids(models.UserProfile.concrete).items()}
+        return types.get(obj.profile_ctype_id, "").capitalize()
+
+    type.admin_order_field = "profile__polymorphic_ctype"
 
 
 # Register the new user admin
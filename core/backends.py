@@ -0,0 +1,33 @@
+"""Authentication backends for Anduril."""
+
+from django.contrib.auth.backends import ModelBackend
+
+from .models import User
+from . import snapshots
+
+
+class ProfileModelBackend(ModelBackend):
+    """Model backend that loads the user profile with the user.
+
+    Nearly every page looks at the profile type of the request user.
+    If a profile snapshot is cached, the user is loaded alone and the
+    snapshot attached. Otherwise, the concrete profile is resolved in
+    the same query that loads the user and a snapshot is cached for
+    the next request.
+    """
+
+    def get_user(self, user_id):
+        """Get a user with their snapshot and possibly profile attached."""
+
+        snapshot = snapshots.cached(user_id)
+        queryset = User.objects if snapshot else User.objects.with_profile()
+        try:
+            user = queryset.get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+
+        if snapshot:
+            user._snapshot = snapshot
+        else:
+            snapshots.get(user)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,163 @@
+"""Query count and latency benchmarks for every routed view.
+
+Each route in the home, groups, and api sites is requested as a user of
+every profile type through the test client. For each request the number
+of queries, time spent in the database, and wall time are recorded,
+and repeated runs are summarized by their median and 95th percentile.
+Results are plain dictionaries so they can be written as JSON and
+compared against a baseline from an earlier run.
+"""
+
+import datetime
+import json
+import math
+import re
+import statistics
+import time
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from oauth2_provider.models import AccessToken, Application
+
+import api.site
+import groups.site
+import home.site
+from .models import User, UserProfile
+
+
+# URL prefixes of each benchmarked site
+SITES = (("", home.site.urls), ("groups/", groups.site.urls), ("api/", api.site.urls))
+
+# Values substituted for named groups in route patterns
+SAMPLES = {"typeof": "club", "kind": "ndjson"}
+
+# Routes that end the session or need a request body
+SKIP = ("logout/",)
+POST = {"api/users/lookup/": {"ids": [1, 2], "student_ids": ["100002", "100003"]}}
+
+
+def routes() -> list:
+    """Get a concrete path for every route of the benchmarked sites."""
+
+    paths = []
+    for prefix, urls in SITES:
+        for pattern in urls:
+            regex = pattern.regex.pattern
+            path = re.sub(r"\(\?P<(\w+)>[^)]*\)\??", lambda match: SAMPLES[match.group(1)], regex)
+            path = prefix + path.lstrip("^").rstrip("$").replace("\\", "")
+            if path not in SKIP:
+                paths.append(path)
+    return paths
+
+
+def percentile(values, fraction):
+    """Get a nearest rank percentile of values."""
+
+    values = sorted(values)
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def clients(types=None) -> dict:
+    """Create a logged in test client for a user of each profile type.
+
+    Clients carry both a session and a bearer token so the same client
+    can request pages and the API.
+    """
+
+    application, _ = Application.objects.get_or_create(
+        name="benchmark",
+        defaults={
+            "client_type": Application.CLIENT_CONFIDENTIAL,
+            "authorization_grant_type": Application.GRANT_CLIENT_CREDENTIALS})
+    result = {}
+    for profile_type in types or UserProfile.concrete:
+        user = User.objects.filter(profile__polymorphic_ctype__model=UserProfile.concrete[profile_type]._meta.model_name)
+        user = user.order_by("id").first()
+        if user is None:
+            continue
+        token = AccessToken.objects.create(
+            user=user,
+            application=application,
+            token=f"benchmark-{profile_type}-{user.pk}",
+            scope="read write",
+            expires=timezone.now() + datetime.timedelta(days=1))
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {token.token}")
+        client.force_login(user)
+        result[profile_type] = client
+    return result
+
+
+def measure(client, path, repeat=5) -> dict:
+    """Request a path repeatedly after a warm up and summarize the runs.
+
+    Views that raise are recorded with their error instead of timings.
+    """
+
+    def request():
+        if path in POST:
+            return client.post(f"/{path}", json.dumps(POST[path]), content_type="application/json")
+        return client.get(f"/{path}")
+
+    try:
+        request()
+    except Exception as error:
+        return {"status": 500, "error": f"{type(error).__name__}: {error}"}
+
+    queries, database, wall = [], [], []
+    status = None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = request()
+            if response.streaming:
+                b"".join(response.streaming_content)
+            wall.append((time.perf_counter() - start) * 1000)
+        status = response.status_code
+        queries.append(len(context))
+        database.append(sum(float(query["time"]) for query in context.captured_queries) * 1000)
+    return {
+        "status": status,
+        "queries": max(queries),
+        "db_ms": statistics.median(database),
+        "p50_ms": statistics.median(wall),
+        "p95_ms": percentile(wall, 0.95)}
+
+
+def run(types=None, repeat=5, paths=None) -> dict:
+    """Benchmark every route as every profile type."""
+
+    results = {}
+    for profile_type, client in clients(types).items():
+        for path in paths or routes():
+            results[f"{profile_type} /{path}"] = measure(client, path, repeat)
+    return results
+
+
+def compare(baseline, results, queries=0, latency=0.25, slack=5.0) -> list:
+    """List the views that regressed against a baseline.
+
+    A view regresses when it runs more than queries extra queries, or
+    when its 95th percentile grows by more than the latency fraction
+    and by more than slack milliseconds, which keeps noise on fast
+    views from failing the comparison.
+    """
+
+    regressions = []
+    for key, result in sorted(results.items()):
+        before = baseline.get(key)
+        if before is None:
+            continue
+        if "error" in result:
+            if "error" not in before:
+                regressions.append(f"{key}: {result['error']}")
+            continue
+        if "error" in before:
+            continue
+        if result["queries"] > before["queries"] + queries:
+            regressions.append(f"{key}: {before['queries']} -> {result['queries']} queries")
+        grown = result["p95_ms"] - before["p95_ms"]
+        if grown > before["p95_ms"] * latency and grown > slack:
+            regressions.append(f"{key}: p95 {before['p95_ms']:.1f}ms -> {result['p95_ms']:.1f}ms")
+    return regressions
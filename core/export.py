@@ -0,0 +1,91 @@
+"""Streaming export of every user and their profile.
+
+Users are read with a database iterator so rows are not cached on the
+queryset, and each row is written out as soon as it is read. Memory use
+stays flat however many users there are, which lets the same generators
+back both a streaming HTTP response and a management command.
+"""
+
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import User, UserProfile
+
+
+USER_COLUMNS = ("id", "username", "email", "first_name", "last_name", "is_active", "date_joined", "last_login")
+PROFILE_COLUMNS = ("type", "middle_name", "display_first_name", "display_last_name")
+
+FORMATS = ("csv", "ndjson")
+
+
+def child_columns() -> tuple:
+    """Get the union of the fields specific to each profile type."""
+
+    columns = []
+    for model in UserProfile.concrete.values():
+        for field in model._meta.local_concrete_fields:
+            if not field.primary_key and field.attname not in columns:
+                columns.append(field.attname)
+    return tuple(columns)
+
+
+def columns() -> tuple:
+    """Get every column of the export in order."""
+
+    return USER_COLUMNS + PROFILE_COLUMNS + child_columns()
+
+
+def rows():
+    """Yield a dictionary per user, ordered by ID.
+
+    Fields that don't apply to a user's profile type are None.
+    """
+
+    names = child_columns()
+    for user in User.objects.with_profile().order_by("id").iterator():
+        row = {column: getattr(user, column) for column in USER_COLUMNS}
+        try:
+            profile = user.profile
+        except UserProfile.DoesNotExist:
+            profile = None
+        for column in PROFILE_COLUMNS + names:
+            row[column] = getattr(profile, column, None)
+        yield row
+
+
+class Echo:
+    """File-like object that returns what is written to it."""
+
+    def write(self, value):
+        """Return the value instead of buffering it."""
+
+        return value
+
+
+def csv_lines(records):
+    """Yield a CSV header and then one line per record."""
+
+    header = columns()
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for record in records:
+        yield writer.writerow(["" if record[column] is None else record[column] for column in header])
+
+
+def ndjson_lines(records):
+    """Yield one JSON object per line per record."""
+
+    for record in records:
+        yield json.dumps(record, cls=DjangoJSONEncoder) + "\n"
+
+
+def lines(format):
+    """Yield the lines of an export in a format."""
+
+    if format == "csv":
+        return csv_lines(rows())
+    elif format == "ndjson":
+        return ndjson_lines(rows())
+    raise ValueError(f"Unknown export format {format}")
@@ -0,0 +1,142 @@
+"""Recording of login statistics.
+
+Logins are counted with a single conditional UPDATE rather than a read
+followed by a full row save, so simultaneous logins from two devices
+can't lose a count. During the morning rush, login events can instead
+be buffered in memory and flushed periodically with one UPDATE for
+every user that logged in since the last flush.
+"""
+
+import atexit
+import collections
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, DateTimeField, F, IntegerField, Value, When
+from django.db.models.functions import Coalesce
+
+
+# Most users updated per statement
+FLUSH_BATCH_SIZE = 300
+
+# Parameters a flush binds per user: the user in the WHERE, in the count
+# CASE with at worst a count of its own, and in the first login CASE
+# with its time. Batches are cut down to fit the database's limit.
+FLUSH_PARAMETERS_PER_USER = 5
+
+
+def statistics():
+    """Get the user statistics model without a circular import."""
+
+    return apps.get_model("core", "UserStatistics")
+
+
+def record(user_id, when):
+    """Count a single login immediately."""
+
+    statistics().objects.filter(user_id=user_id).update(
+        login_count=F("login_count") + 1,
+        first_login=Coalesce(F("first_login"), Value(when)))
+
+
+def apply(counts, first_logins):
+    """Add buffered login counts to the database in bulk."""
+
+    ids = list(counts)
+    size = min(FLUSH_BATCH_SIZE, connection.ops.bulk_batch_size([None] * FLUSH_PARAMETERS_PER_USER, ids) or 1)
+    for i in range(0, len(ids), size):
+        batch = ids[i:i+size]
+
+        # Users are grouped by count to keep the statement short
+        by_count = collections.defaultdict(list)
+        for user_id in batch:
+            by_count[counts[user_id]].append(user_id)
+
+        increment = Case(
+            *(When(user_id__in=users, then=Value(count)) for count, users in by_count.items()),
+            output_field=IntegerField())
+        first_login = Case(
+            *(When(user_id=user_id, then=Value(first_logins[user_id])) for user_id in batch),
+            output_field=DateTimeField())
+
+        statistics().objects.filter(user_id__in=batch).update(
+            login_count=F("login_count") + increment,
+            first_login=Coalesce(F("first_login"), first_login))
+
+
+class LoginBuffer:
+    """Collects login events in memory and flushes them periodically.
+
+    A flush is scheduled on a timer when the first event after a flush
+    comes in, and anything left over is flushed when the process exits.
+    """
+
+    def __init__(self, interval):
+        """Initialize an empty buffer."""
+
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.counts = collections.Counter()
+        self.first_logins = {}
+        self.timer = None
+        atexit.register(self.flush)
+
+    def add(self, user_id, when):
+        """Buffer a login event."""
+
+        with self.lock:
+            self.counts[user_id] += 1
+            self.first_logins.setdefault(user_id, when)
+            if self.timer is None:
+                self.timer = threading.Timer(self.interval, self.flush_from_timer)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        """Write all buffered events to the database.
+
+        If the write fails, the events are buffered again and the error
+        is raised.
+        """
+
+        with self.lock:
+            counts, first_logins = self.counts, self.first_logins
+            self.counts, self.first_logins = collections.Counter(), {}
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+        if not counts:
+            return
+        try:
+            with transaction.atomic():
+                apply(counts, first_logins)
+        except Exception:
+            # Put the events back for the next flush, keeping the earlier first logins
+            with self.lock:
+                self.counts.update(counts)
+                self.first_logins.update(first_logins)
+            raise
+
+    def flush_from_timer(self):
+        """Flush from the timer thread and release its connection."""
+
+        try:
+            self.flush()
+        finally:
+            connection.close()
+
+
+interval = getattr(settings, "LOGIN_STATISTICS_FLUSH_INTERVAL", None)
+buffer = LoginBuffer(interval) if interval else None
+
+
+def login(user_id, when):
+    """Count a login, buffering it if configured to."""
+
+    if buffer is not None:
+        buffer.add(user_id, when)
+    else:
+        record(user_id, when)
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+import json
+import time
+
+from core import benchmark, synthetic
+from lib import testing
+
+
+class Command(BaseCommand):
+    """Benchmarks the queries and latency of every view."""
+
+    help = """\
+    This command builds a throwaway database, seeds it with a synthetic
+    school, and requests every route of the home, groups, and api sites
+    as each profile type. The query count, database time, and median and
+    95th percentile wall time of each view are printed or written as
+    JSON. With --compare, the command fails if any view runs more
+    queries or has a slower 95th percentile than a previous run.
+    """
+
+    def add_arguments(self, parser):
+        """Add arguments to the parser."""
+
+        parser.add_argument("-o", "--output", dest="output", default=None, help="File to write results to as JSON.")
+        parser.add_argument("--compare", dest="compare", default=None, help="JSON results to compare against.")
+        parser.add_argument("-r", "--repeat", dest="repeat", type=int, default=5, help="Requests per view.")
+        parser.add_argument("--users", dest="users", type=int, default=3300, help="Users to seed.")
+        parser.add_argument("--groups", dest="groups", type=int, default=300, help="Groups to seed.")
+        parser.add_argument("--seed", dest="seed", type=int, default=0, help="Random seed of the dataset.")
+        parser.add_argument("--query-threshold", dest="query_threshold", type=int, default=0,
+                            help="Extra queries allowed before a view counts as regressed.")
+        parser.add_argument("--latency-threshold", dest="latency_threshold", type=float, default=0.25,
+                            help="Fractional p95 growth allowed before a view counts as regressed.")
+
+    def handle(self, *args, output=None, compare=None, repeat=5, users=3300, groups=300, seed=0,
+               query_threshold=0, latency_threshold=0.25, **kwargs):
+        """Run the actual command."""
+
+        baseline = None
+        if compare:
+            with open(compare) as file:
+                baseline = json.load(file)["results"]
+
+        # The throwaway database reuses user IDs, so it gets its own caches
+        name = connection.settings_dict["NAME"]
+        setup_test_environment()
+        caches = override_settings(CACHES=testing.local_caches())
+        caches.enable()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            start = time.perf_counter()
+            dataset = synthetic.generate(users=users, groups=groups, seed=seed)
+            self.stderr.write(f"Seeded {dataset.users} users, {dataset.groups} groups, {dataset.memberships} "
+                              f"memberships, {dataset.friendships} friendships, {dataset.requests} requests "
+                              f"in {time.perf_counter() - start:.1f}s")
+            results = benchmark.run(repeat=max(repeat, 1))
+        finally:
+            connection.creation.destroy_test_db(name, verbosity=0)
+            caches.disable()
+            teardown_test_environment()
+
+        if output:
+            with open(output, "w") as file:
+                json.dump({"dataset": dataset._asdict(), "results": results}, file, indent=2, sort_keys=True)
+        else:
+            self.stdout.write(f"{'view':<40}{'status':>7}{'queries':>9}{'db ms':>9}{'p50 ms':>9}{'p95 ms':>9}")
+            for key, result in sorted(results.items()):
+                if "error" in result:
+                    self.stdout.write(f"{key:<40}{result['status']:>7}  {result['error']}")
+                    continue
+                self.stdout.write(f"{key:<40}{result['status']:>7}{result['queries']:>9}{result['db_ms']:>9.1f}"
+                                  f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}")
+
+        if baseline is not None:
+            regressions = benchmark.compare(baseline, results, query_threshold, latency_threshold)
+            if regressions:
+                raise CommandError("Views regressed:\n" + "\n".join(regressions))
+            self.stderr.write(f"No regressions against {compare}")
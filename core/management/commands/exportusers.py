@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from core import export
+
+
+class Command(BaseCommand):
+    """Streams every user and profile to a CSV or NDJSON file."""
+
+    help = """\
+    This command exports every user with their profile, one row per
+    user, writing each row as soon as it is read from the database so
+    memory use stays flat. Fields that don't apply to a user's profile
+    type are left empty.
+    """
+
+    def add_arguments(self, parser):
+        """Add arguments to the parser."""
+
+        parser.add_argument("-f", "--format", dest="format", choices=export.FORMATS, default="csv",
+                            help="Export format, csv by default.")
+        parser.add_argument("-o", "--output", dest="output", default=None,
+                            help="File to write to instead of standard output.")
+
+    def handle(self, *args, format="csv", output=None, **kwargs):
+        """Run the actual command."""
+
+        if output:
+            with open(output, "w", newline="") as file:
+                file.writelines(export.lines(format))
+        else:
+            for line in export.lines(format):
+                self.stdout.write(line, ending="")
@@ -1,9 +1,13 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.hashers import make_password
 
 import csv
+import itertools
+import multiprocessing
 import os
-import string
+import time
+
+from lib.records import printable
 
 
 def generate_hashed_filename(path):
@@ -14,11 +18,15 @@ def generate_hashed_filename(path):
     return os.path.join(head, ".".join((name, "hashed", extension.lstrip("."))))
 
 
-def printable(handle):
-    """Generator that filters non-printable characters while reading."""
+def chunks(iterable, size):
+    """Yield successive lists of at most size items from an iterable."""
 
-    for line in handle:
-        yield "".join(filter(lambda x: x in string.printable, line))
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
 
 
 class Command(BaseCommand):
@@ -29,7 +37,9 @@ class Command(BaseCommand):
     internal system. The main argument is the CSV file of student
     information, and by default, the column with the label `password`
     will be the one replaced with hashes. This behavior can be changed
-    either by selecting a different column name or index.
+    either by selecting a different column name or index. Hashing can
+    be spread across several processes with the workers option, in
+    which case rows are still written in their original order.
     """
 
     def add_arguments(self, parser):
@@ -44,8 +54,12 @@ class Command(BaseCommand):
                             only mode that assumes there isn't a header.")
         parser.add_argument("-n", "--name", dest="name",
                             help="Select the password column by column name.")
+        parser.add_argument("-w", "--workers", dest="workers", type=int, default=1,
+                            help="Number of processes to hash passwords with. Defaults to a single process.")
+        parser.add_argument("-c", "--chunk-size", dest="chunk_size", type=int, default=256,
+                            help="Number of rows read, hashed, and written at a time.")
 
-    def handle(self, dump, *args, index=None, name=None, header=None, **kwargs):
+    def handle(self, dump, *args, index=None, name=None, header=None, workers=1, chunk_size=256, **kwargs):
         """Run the actual command."""
 
         hashed = generate_hashed_filename(dump)
@@ -64,10 +78,30 @@ class Command(BaseCommand):
                 columns = list(map(lambda s: s.lower(), header))
                 name = name or "password"
                 if name not in columns:
-                    print("Cannot find specified column name in CSV file!")
-                    return
+                    raise CommandError(f"Cannot find column {name!r} in {dump}")
                 index = columns.index(name)
 
-            for line in reader:
-                line[index] = make_password(line[index])
-                writer.writerow(line)
+            # Only fork when there is more than one worker
+            pool = multiprocessing.Pool(workers) if workers > 1 else None
+            hash_all = pool.map if pool else lambda function, items: list(map(function, items))
+
+            count = 0
+            start = time.perf_counter()
+            try:
+                for chunk in chunks(reader, max(chunk_size, 1)):
+                    passwords = hash_all(make_password, [line[index] for line in chunk])
+                    for line, password in zip(chunk, passwords):
+                        line[index] = password
+                    writer.writerows(chunk)
+
+                    count += len(chunk)
+                    if kwargs.get("verbosity", 1) > 1:
+                        self.stdout.write(f"Hashed {count} rows")
+            finally:
+                if pool:
+                    pool.close()
+                    pool.join()
+
+            elapsed = time.perf_counter() - start
+            rate = count / elapsed if elapsed else 0
+            self.stdout.write(f"Hashed {count} rows in {elapsed:.2f}s ({rate:.1f} rows/sec) using {workers} worker(s)")
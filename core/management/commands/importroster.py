@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+import time
+
+from core.roster import import_roster
+from lib.records import read_records
+
+
+class Command(BaseCommand):
+    """Creates or updates users from a roster file in bulk."""
+
+    help = """\
+    This command provisions users from a CSV or JSONL roster. Each row
+    needs a profile type, and optionally a username, first_name,
+    last_name, email, a password already hashed by hashpasswords, and
+    profile fields prefixed with profile__ (e.g. profile__student_id).
+    Usernames are generated for rows that leave them blank, which then
+    need a student ID or email. Rows are keyed by username, student ID,
+    or email, so re-running the command on the same file only updates
+    rows that have changed.
+    """
+
+    def add_arguments(self, parser):
+        """Add arguments to the parser."""
+
+        parser.add_argument("roster", help="the CSV or JSONL roster file.")
+        parser.add_argument("-b", "--batch-size", dest="batch_size", type=int, default=500,
+                            help="Number of rows created per transaction.")
+
+    def handle(self, roster, *args, batch_size=500, **kwargs):
+        """Run the actual command."""
+
+        start = time.perf_counter()
+        try:
+            counts = import_roster(read_records(roster), batch_size=max(batch_size, 1))
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Created {counts['created']}, updated {counts['updated']}, "
+            f"left {counts['unchanged']} unchanged in {elapsed:.2f}s")
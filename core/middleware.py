@@ -0,0 +1,36 @@
+"""Middleware for Anduril."""
+
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.auth import middleware
+from django.utils.functional import SimpleLazyObject
+
+
+BACKEND = "core.backends.ProfileModelBackend"
+
+# Backends that logged in sessions before ProfileModelBackend
+PREVIOUS_BACKENDS = ("django.contrib.auth.backends.ModelBackend",)
+
+
+def get_user(request):
+    """Get the user of a request, moving its session off a previous backend."""
+
+    if request.session.get(BACKEND_SESSION_KEY) in PREVIOUS_BACKENDS:
+        request.session[BACKEND_SESSION_KEY] = BACKEND
+    return middleware.get_user(request)
+
+
+class AuthenticationMiddleware(middleware.AuthenticationMiddleware):
+    """Authentication middleware that keeps sessions from previous backends.
+
+    Django only restores the user of a session whose backend is still in
+    AUTHENTICATION_BACKENDS. Rather than listing the stock model backend,
+    which would check the password of every failed login twice, sessions
+    it logged in are moved to ProfileModelBackend when the user is first
+    loaded.
+    """
+
+    def process_request(self, request):
+        """Lazily set the user of the request."""
+
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
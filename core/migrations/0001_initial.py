@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 08:22
+from __future__ import unicode_literals
+
+import core.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0008_alter_user_username_max_length'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProfile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creation_time', models.DateTimeField(auto_now_add=True)),
+                ('modification_time', models.DateTimeField(auto_now=True)),
+                ('middle_name', models.CharField(blank=True, max_length=60, null=True)),
+                ('display_first_name', models.CharField(blank=True, max_length=60, null=True)),
+                ('display_last_name', models.CharField(blank=True, max_length=60, null=True)),
+            ],
+            options={
+                'manager_inheritance_from_future': True,
+            },
+        ),
+        migrations.CreateModel(
+            name='UserStatistics',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_login', models.DateTimeField(blank=True, null=True)),
+                ('login_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='User',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+            },
+            bases=('auth.user',),
+            managers=[
+                ('objects', core.models.UserManager()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AlumnusUserProfile',
+            fields=[
+                ('userprofile_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='core.UserProfile')),
+                ('graduation_year', models.IntegerField(blank=True, null=True)),
+            ],
+            options={
+                'manager_inheritance_from_future': True,
+            },
+            bases=('core.userprofile',),
+        ),
+        migrations.CreateModel(
+            name='CounselorUserProfile',
+            fields=[
+                ('userprofile_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='core.UserProfile')),
+            ],
+            options={
+                'manager_inheritance_from_future': True,
+            },
+            bases=('core.userprofile',),
+        ),
+        migrations.CreateModel(
+            name='StaffUserProfile',
+            fields=[
+                ('userprofile_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='core.UserProfile')),
+                ('title', models.CharField(max_length=30)),
+            ],
+            options={
+                'manager_inheritance_from_future': True,
+            },
+            bases=('core.userprofile',),
+        ),
+        migrations.CreateModel(
+            name='StudentUserProfile',
+            fields=[
+                ('userprofile_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='core.UserProfile')),
+                ('student_id', models.CharField(max_length=8, unique=True)),
+                ('graduation_year', models.IntegerField(blank=True, null=True)),
+                ('counselor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.User')),
+            ],
+            options={
+                'manager_inheritance_from_future': True,
+            },
+            bases=('core.userprofile',),
+        ),
+        migrations.CreateModel(
+            name='TeacherUserProfile',
+            fields=[
+                ('userprofile_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='core.UserProfile')),
+            ],
+            options={
+                'manager_inheritance_from_future': True,
+            },
+            bases=('core.userprofile',),
+        ),
+        migrations.AddField(
+            model_name='userstatistics',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='statistics', to='core.User'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='polymorphic_ctype',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='polymorphic_core.userprofile_set+', to='contenttypes.ContentType'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to='core.User'),
+        ),
+    ]
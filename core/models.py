@@ -5,15 +5,38 @@ via the polymorphic library, to serve as different types of each.
 """
 
 from django.db import models
+from django.db.models.query import ModelIterable
 from polymorphic.models import PolymorphicModel
 from django.contrib.auth import models as auth
 from django.contrib.auth.signals import user_logged_in
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.db.models.fields import related_descriptors
 from django.dispatch import receiver
 from django.utils import timezone
 
-from lib.models import TimeTrackingModel
+from lib.models import TimeTrackingModel, DirtyTrackingModel
+from lib.polymorphic import downcast, select_children
+from . import logins, snapshots
+
+
+def attach_profile(user):
+    """Replace a user's joined base profile with its concrete child."""
+
+    try:
+        user.profile = downcast(user.profile)
+    except UserProfile.DoesNotExist:
+        pass
+    return user
+
+
+class ProfileIterable(ModelIterable):
+    """Yields users with concrete profiles from a joined query."""
+
+    def __iter__(self):
+        """Attach the concrete profile to each user."""
+
+        for user in super().__iter__():
+            yield attach_profile(user)
 
 
 class UserManager(auth.UserManager):
@@ -43,6 +66,19 @@ class UserManager(auth.UserManager):
         user.save()
         return user
 
+    def with_profile(self):
+        """Select users and their concrete profiles in a single query.
+
+        Accessing the profile of a user through the polymorphic manager
+        costs one query for the base table and another for the child
+        table. Instead, every child table is left joined here and the
+        concrete profile is picked out of the result.
+        """
+
+        queryset = self.select_related("profile", *select_children("profile", UserProfile))
+        queryset._iterable_class = ProfileIterable
+        return queryset
+
 
 class User(auth.User):
     """User proxy that overrides user create."""
@@ -68,20 +104,33 @@ class User(auth.User):
 
         return f"/users/{self.id}"
 
+    @property
+    def snapshot(self):
+        """Get the cached snapshot of commonly used profile fields."""
+
+        return snapshots.get(self)
+
 
 @receiver(post_save, sender=User)
-def on_create_user(sender, instance, created, **kwargs):
-    """Add members to the user when it is created."""
+def on_create_user(sender, instance, created, update_fields=None, **kwargs):
+    """Add members to the user when it is created and save their changes."""
 
     if created:
         UserStatistics.objects.create(user=instance)
         return
 
-    instance.profile.save()
-    instance.statistics.save()
+    # Targeted saves like the last login update only concern the user
+    if update_fields is not None:
+        return
+
+    # Members that were never loaded can't have been changed
+    for descriptor in (User.profile, User.statistics):
+        member = instance.__dict__.get(descriptor.cache_name)
+        if member is not None:
+            member.save_dirty()
 
 
-class UserProfile(PolymorphicModel, TimeTrackingModel):
+class UserProfile(PolymorphicModel, TimeTrackingModel, DirtyTrackingModel):
     """Base user profile model."""
 
     # Enumerated profile types
@@ -146,7 +195,7 @@ class UserProfile(PolymorphicModel, TimeTrackingModel):
         return self.first_name + " " + self.last_name
 
 
-class UserStatistics(models.Model):
+class UserStatistics(DirtyTrackingModel):
     """User statistics object.
     
     This is here to collect arbitrary bits of data about site usage, 
@@ -167,13 +216,7 @@ class UserStatistics(models.Model):
 def update_user_login_statistics(sender, user, request, **kwargs):
     """Called when a user logs into the system."""
 
-    try:
-        if user.statistics.login_count == 0:
-            user.statistics.first_login = timezone.now()
-        user.statistics.login_count += 1
-        user.statistics.save()
-    except UserStatistics.DoesNotExist:
-        pass
+    logins.login(user.pk, timezone.now())
 
 
 @UserProfile.register(UserProfile.STUDENT)
@@ -181,7 +224,7 @@ class StudentUserProfile(UserProfile):
     """Student subclass of the user profile."""
 
     student_id = models.CharField(max_length=8, unique=True)
-    graduation_year = models.IntegerField(blank=True, null=True)
+    graduation_year = models.IntegerField(blank=True, null=True, db_index=True)
     counselor = models.ForeignKey(User, blank=True, null=True)
 
 
@@ -206,4 +249,22 @@ class StaffUserProfile(UserProfile):
 class AlumnusUserProfile(UserProfile):
     """Staff subclass of the user profile."""
 
-    graduation_year = models.IntegerField(blank=True, null=True)
+    graduation_year = models.IntegerField(blank=True, null=True, db_index=True)
+
+
+def on_change_user_or_profile(sender, instance, **kwargs):
+    """Drop the cached snapshot of a user whose data changed."""
+
+    if isinstance(instance, auth.User):
+        user, user_id = instance, instance.pk
+    else:
+        user, user_id = getattr(instance, "_user_cache", None), instance.user_id
+
+    if user is not None:
+        user.__dict__.pop("_snapshot", None)
+    snapshots.invalidate(user_id)
+
+
+for model in (auth.User, User, UserProfile, *UserProfile.concrete.values()):
+    post_save.connect(on_change_user_or_profile, sender=model)
+    post_delete.connect(on_change_user_or_profile, sender=model)
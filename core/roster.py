@@ -0,0 +1,204 @@
+"""Bulk user provisioning from school roster exports.
+
+Creating users one at a time with the user manager costs several round
+trips per user, which adds up quickly for a whole school. The functions
+here create users, their polymorphic profiles, statistics, and login
+permission in a handful of bulk queries per batch. Rosters are keyed by
+username, or for rows exported without one by student ID or else email,
+so importing the same file twice updates changed rows rather than
+duplicating them.
+"""
+
+import collections
+import itertools
+
+from django.contrib.auth.hashers import identify_hasher
+from django.contrib.auth.models import Permission
+from django.db import transaction
+
+from lib.polymorphic import bulk_create_polymorphic
+from .models import User, UserProfile, UserStatistics, StudentUserProfile
+from . import rules, snapshots
+
+
+USER_FIELDS = ("first_name", "last_name", "email", "password")
+PROFILE_PREFIX = "profile__"
+
+Row = collections.namedtuple("Row", ("username", "type", "user", "profile"))
+
+
+def clean(model, name, value):
+    """Convert a raw roster value to the Python value of a model field."""
+
+    field = model._meta.get_field(name)
+    if value == "" and field.null:
+        return None
+    return field.to_python(value)
+
+
+def parse(record):
+    """Split a roster record into username, type, user and profile fields."""
+
+    username = record.get("username", "").strip()
+    profile_type = record.get("type", "").strip().lower()
+    if profile_type not in UserProfile.concrete:
+        raise ValueError(f"Unknown profile type {profile_type!r} for {username or 'record'}")
+
+    user_fields = {field: clean(User, field, record.get(field, "")) for field in USER_FIELDS if field in record}
+    password = user_fields.pop("password", None)
+    if password:
+        user_fields["password"] = password
+        try:
+            identify_hasher(password)
+        except ValueError:
+            raise ValueError(f"Password for {username} is not hashed; run hashpasswords first")
+
+    # Roster columns for other profile types are left blank
+    model = UserProfile.concrete[profile_type]
+    fields = {field.name for field in model._meta.concrete_fields}
+    profile_fields = {}
+    for field, value in record.items():
+        if field.startswith(PROFILE_PREFIX):
+            name = field[len(PROFILE_PREFIX):]
+            if name in fields:
+                profile_fields[name] = clean(model, name, value)
+            elif value not in ("", None):
+                raise ValueError(f"{model.__name__} has no field {name!r} for {username}")
+
+    return Row(username, profile_type, user_fields, profile_fields)
+
+
+def key(row):
+    """Get the key a row exported without a username is matched on."""
+
+    if row.profile.get("student_id"):
+        return "student_id", row.profile["student_id"]
+    if row.user.get("email"):
+        return "email", row.user["email"]
+    name = " ".join(filter(None, (row.user.get("first_name"), row.user.get("last_name")))) or "record"
+    raise ValueError(f"Record for {name} needs a username, student ID, or email")
+
+
+def resolve_usernames(rows):
+    """Fill in usernames for rows that were exported without one.
+
+    Students already imported are matched by student ID and everyone
+    else by email, so a re-run doesn't allocate a second account. Rows
+    with the same key share one new username from the allocator.
+    """
+
+    keys = {i: key(row) for i, row in enumerate(rows) if not row.username}
+    values = collections.defaultdict(set)
+    for kind, value in keys.values():
+        values[kind].add(value)
+
+    known = {}
+    if values["student_id"]:
+        students = StudentUserProfile.objects.filter(student_id__in=values["student_id"])
+        known.update((("student_id", student_id), username)
+                     for student_id, username in students.values_list("student_id", "user__username"))
+    if values["email"]:
+        for email, username in User.objects.filter(email__in=values["email"]).values_list("email", "username"):
+            if ("email", email) in known:
+                raise ValueError(f"More than one user has the email {email}")
+            known["email", email] = username
+
+    unknown = {}
+    for i, row_key in keys.items():
+        if row_key in known or row_key in unknown:
+            continue
+        row = rows[i]
+        if not row.user.get("first_name") or not row.user.get("last_name"):
+            raise ValueError("Username generation requires first and last name")
+        unknown[row_key] = (row.user["first_name"], row.user["last_name"])
+
+    known.update(zip(unknown, rules.allocate_usernames(unknown.values())))
+    for i, row_key in keys.items():
+        rows[i] = rows[i]._replace(username=known[row_key])
+    return rows
+
+
+def changes(instance, fields):
+    """Return the subset of fields that differ from an instance."""
+
+    return {name: value for name, value in fields.items() if getattr(instance, name) != value}
+
+
+def import_batch(records, permission, counts):
+    """Create or update a single batch of roster records."""
+
+    parsed = {row.username: row for row in resolve_usernames(list(map(parse, records)))}
+
+    existing = {user.username: user for user in User.objects.filter(username__in=parsed)}
+    profiles = {profile.user_id: profile for profile in UserProfile.objects.filter(user__in=existing.values())}
+
+    # Update existing users that have changed
+    recreate = []
+    updated = []
+    for username, user in existing.items():
+        row = parsed[username]
+        profile = profiles.get(user.id)
+        changed = changes(user, row.user)
+        if changed:
+            User.objects.filter(pk=user.pk).update(**changed)
+
+        if profile is None or profile.type != row.type:
+            if profile is not None:
+                profile.delete()
+            recreate.append(user)
+            updated.append(user.id)
+            continue
+
+        changed_profile = changes(profile, row.profile)
+        if changed_profile:
+            type(profile).objects.filter(pk=profile.pk).update(**changed_profile)
+        if changed or changed_profile:
+            updated.append(user.id)
+
+    # Queryset updates don't send signals
+    snapshots.invalidate(*updated)
+    counts["updated"] += len(updated)
+    counts["unchanged"] += len(existing) - len(updated)
+
+    # Create users that don't exist yet
+    created = [User(username=username, **row.user) for username, row in parsed.items() if username not in existing]
+    for user in created:
+        if not user.password:
+            user.set_unusable_password()
+    User.objects.bulk_create(created)
+    created = list(User.objects.filter(username__in=[user.username for user in created]))
+    counts["created"] += len(created)
+
+    UserStatistics.objects.bulk_create(UserStatistics(user_id=user.id) for user in created)
+
+    # Link the login permission for everyone missing it
+    through = User.user_permissions.through
+    ids = [user.id for user in itertools.chain(existing.values(), created)]
+    linked = set(through.objects.filter(user_id__in=ids, permission=permission).values_list("user_id", flat=True))
+    through.objects.bulk_create(through(user_id=id, permission=permission) for id in ids if id not in linked)
+
+    # Create profiles in bulk by type
+    by_type = collections.defaultdict(list)
+    for user in itertools.chain(recreate, created):
+        row = parsed[user.username]
+        by_type[row.type].append(UserProfile.concrete[row.type](user_id=user.id, **row.profile))
+    for profile_type, new in by_type.items():
+        bulk_create_polymorphic(UserProfile.concrete[profile_type], new, key="user_id")
+
+
+def import_roster(records, batch_size=500):
+    """Import roster records in transactions of batch_size rows.
+
+    Returns a counter of created, updated, and unchanged users.
+    """
+
+    counts = collections.Counter(created=0, updated=0, unchanged=0)
+    permission = Permission.objects.get(codename="can_login")
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, batch_size))
+        if not batch:
+            break
+        with transaction.atomic():
+            import_batch(batch, permission, counts)
+    return counts
@@ -4,9 +4,19 @@ This module is primarily for generating usernames, which have several
 templates based on availability.
 """
 
+import functools
 import itertools
+import operator
 import string
 
+from django.db.models import Q
+
+from .models import User
+
+
+# Name pairs whose existing usernames are fetched in a single query
+ALLOCATION_BATCH_SIZE = 100
+
 
 def filter_name(name):
     """Remove all special characters and lowercase."""
@@ -14,12 +24,8 @@ def filter_name(name):
     return "".join(filter(lambda c: c in string.ascii_lowercase, name.lower()))
 
 
-def generate_username(first_name, last_name):
-    """Create a username generator from a person's information."""
-
-    # Sean H Gabaree
-    first = filter_name(first_name)
-    last = filter_name(last_name)
+def preferred_usernames(first, last):
+    """Yield the finite set of preferred usernames for filtered names."""
 
     # segabare
     yield first[:2] + last[:6]
@@ -36,6 +42,84 @@ def generate_username(first_name, last_name):
     for i in range(1, len(last) - 6 + 1):
         yield first + last[:6+i]
 
+
+def numbered_prefix(first, last):
+    """Return the prefix shared by all numbered usernames."""
+
+    return first[:2] + last
+
+
+def generate_username(first_name, last_name, start=0):
+    """Create a username generator from a person's information.
+
+    Numbered usernames count up from start, so callers that know the
+    lower numbers are taken can skip them.
+    """
+
+    # Sean H Gabaree
+    first = filter_name(first_name)
+    last = filter_name(last_name)
+
+    yield from preferred_usernames(first, last)
+
     # segabaree0
-    for i in itertools.count():
-        yield first[:2] + last + str(i)
+    for i in itertools.count(start):
+        yield numbered_prefix(first, last) + str(i)
+
+
+def existing_usernames(names):
+    """Fetch every taken username that could collide with the names."""
+
+    candidates = set()
+    prefixes = set()
+    for first_name, last_name in names:
+        first = filter_name(first_name)
+        last = filter_name(last_name)
+        candidates.update(preferred_usernames(first, last))
+        prefixes.add(numbered_prefix(first, last))
+
+    # An empty prefix would match everyone, so match bare numbers instead
+    query = functools.reduce(
+        operator.or_,
+        (Q(username__startswith=prefix) if prefix else Q(username__regex=r"^[0-9]+$") for prefix in sorted(prefixes)),
+        Q(username__in=sorted(candidates)))
+    return set(User.objects.filter(query).values_list("username", flat=True))
+
+
+def next_username(first_name, last_name, taken, numbered):
+    """Pick the first username for a name that isn't taken.
+
+    Numbered holds the next number to try for each numbered prefix.
+    Since taken usernames are only ever added, numbering for a common
+    name resumes after the last number handed out instead of from zero.
+    The username is added to taken before it is returned.
+    """
+
+    prefix = numbered_prefix(filter_name(first_name), filter_name(last_name))
+    username = next(u for u in generate_username(first_name, last_name, numbered.get(prefix, 0)) if u not in taken)
+    suffix = username[len(prefix):]
+    if suffix.isdigit():
+        numbered[prefix] = int(suffix) + 1
+    taken.add(username)
+    return username
+
+
+def allocate_usernames(names):
+    """Allocate unique usernames for a sequence of first, last pairs.
+
+    Existing usernames are fetched with one query per batch of names
+    rather than one query per candidate, and names allocated earlier in
+    the sequence are never handed out again. Given the same database
+    state and input order, the allocation is always the same.
+    """
+
+    names = list(names)
+    allocated = []
+    taken = set()
+    numbered = {}
+    for i in range(0, len(names), ALLOCATION_BATCH_SIZE):
+        batch = names[i:i+ALLOCATION_BATCH_SIZE]
+        taken |= existing_usernames(batch)
+        for first_name, last_name in batch:
+            allocated.append(next_username(first_name, last_name, taken, numbered))
+    return allocated
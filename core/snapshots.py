@@ -0,0 +1,125 @@
+"""Cached snapshots of the profile fields most requests need.
+
+Most pages only look at the profile type and display name of the
+request user, and external services mostly want the same few fields.
+Rather than joining the profile tables on every request, a small
+snapshot of these fields is kept in the profiles cache keyed by user
+ID. Saving or deleting a user or profile drops the snapshot, which
+only reaches every worker if the cache is shared between them, so
+multi-worker deployments need a shared SHARED_CACHE_BACKEND.
+"""
+
+import collections
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+
+
+CACHE_ALIAS = getattr(settings, "PROFILE_CACHE", "profiles")
+KEY = "snapshot:{}"
+
+
+class Snapshot(collections.namedtuple("Snapshot", (
+        "id", "username", "email", "type", "first_name", "last_name", "user_first_name", "user_last_name",
+        "student_id", "modification_time"))):
+    """Immutable view of the commonly used user and profile fields.
+
+    The first and last name are the display names if they are set,
+    while user_first_name and user_last_name are the legal names.
+    """
+
+    __slots__ = ()
+
+    @property
+    def full_name(self):
+        """Get the full name of the user."""
+
+        return self.first_name + " " + self.last_name
+
+
+def cache():
+    """Get the cache snapshots are stored in."""
+
+    return caches[CACHE_ALIAS]
+
+
+def build(user):
+    """Build a snapshot from a user, loading the profile if needed."""
+
+    try:
+        profile = user.profile
+    except ObjectDoesNotExist:
+        return None
+
+    return Snapshot(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        type=profile.type,
+        first_name=profile.display_first_name or user.first_name,
+        last_name=profile.display_last_name or user.last_name,
+        user_first_name=user.first_name,
+        user_last_name=user.last_name,
+        student_id=getattr(profile, "student_id", None),
+        modification_time=profile.modification_time)
+
+
+def loaded(user) -> bool:
+    """Check whether a user's profile has already been loaded."""
+
+    from .models import User
+    return User.profile.cache_name in user.__dict__
+
+
+def load(user_id):
+    """Load a user with their concrete profile in one query."""
+
+    from .models import User
+    return User.objects.with_profile().filter(pk=user_id).first()
+
+
+def cached(user_id):
+    """Return the cached snapshot for a user ID if there is one."""
+
+    return cache().get(KEY.format(user_id))
+
+
+def get(user):
+    """Get the snapshot of a user, building and caching it on a miss.
+
+    The snapshot is also memoized on the user object so repeated calls
+    within a request don't go to the cache again. Anonymous users and
+    users without a profile have no snapshot.
+    """
+
+    if user is None or not user.is_authenticated:
+        return None
+    try:
+        return user._snapshot
+    except AttributeError:
+        pass
+
+    snapshot = cached(user.id)
+    if snapshot is None:
+        source = user if loaded(user) else load(user.id)
+        snapshot = build(source) if source is not None else None
+        if snapshot is not None:
+            cache().set(KEY.format(user.id), snapshot)
+    user._snapshot = snapshot
+    return snapshot
+
+
+def invalidate(*user_ids):
+    """Drop the cached snapshots of users.
+
+    Inside a transaction the snapshots are dropped again once it
+    commits, since a concurrent request may cache the old rows before
+    the new ones are visible to it.
+    """
+
+    keys = [KEY.format(user_id) for user_id in user_ids]
+    cache().delete_many(keys)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache().delete_many(keys))
@@ -0,0 +1,330 @@
+"""Synthetic data for benchmarks and scale testing.
+
+Everything is generated from a seeded random number generator and
+written with bulk inserts, so the same arguments always produce the
+same database and building it takes seconds rather than minutes. No
+real student data is involved. Names are drawn from common first and
+last names with a skewed distribution, so username generation runs
+into the same collisions it does with a real roster. Friendships are
+grown by preferential attachment, which gives the long tailed degree
+distribution of real social graphs.
+"""
+
+import collections
+import itertools
+import random
+
+from django.contrib.auth import models as auth
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from groups.models import Group, GroupMembership, ClubGroupRequest, ClubGroupRequestSponsorship
+from home.models import Friendship
+from home import friends
+from lib.polymorphic import bulk_create_polymorphic
+from .models import User, UserProfile, UserStatistics, StudentUserProfile
+from . import rules
+
+
+FIRST_NAMES = (
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth",
+    "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+    "Christopher", "Nancy", "Daniel", "Lisa", "Matthew", "Margaret", "Anthony", "Betty", "Mark", "Sandra",
+    "Donald", "Ashley", "Steven", "Emily", "Paul", "Donna", "Andrew", "Michelle", "Joshua", "Carol",
+    "Kenneth", "Amanda", "Kevin", "Melissa", "Brian", "Deborah", "George", "Stephanie", "Timothy", "Rebecca",
+    "Ronald", "Sharon", "Jason", "Laura", "Edward", "Cynthia", "Jeffrey", "Kathleen", "Ryan", "Amy",
+    "Jacob", "Angela", "Gary", "Shirley", "Nicholas", "Anna", "Eric", "Brenda", "Jonathan", "Pamela",
+    "Stephen", "Emma", "Larry", "Nicole", "Justin", "Helen", "Scott", "Samantha", "Brandon", "Katherine",
+    "Benjamin", "Christine", "Samuel", "Debra", "Gregory", "Rachel", "Alexander", "Carolyn", "Patrick", "Janet",
+    "Frank", "Catherine", "Raymond", "Maria", "Jack", "Heather", "Dennis", "Diane", "Jerry", "Olivia",
+    "Sean", "Seo-yeon", "Wei", "Priya", "Mohammed", "Aaliyah", "Jose", "Ximena", "Hiroshi", "Ngozi",
+    "Li", "Yu", "Al", "Bo", "O'Neil", "Mary-Kate", "Jean Luc", "Zoë", "Renée", "José")
+
+LAST_NAMES = (
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+    "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson",
+    "Walker", "Young", "Allen", "King", "Wright", "Scott", "Torres", "Nguyen", "Hill", "Flores",
+    "Green", "Adams", "Nelson", "Baker", "Hall", "Rivera", "Campbell", "Mitchell", "Carter", "Roberts",
+    "Gomez", "Phillips", "Evans", "Turner", "Diaz", "Parker", "Cruz", "Edwards", "Collins", "Reyes",
+    "Stewart", "Morris", "Morales", "Murphy", "Cook", "Rogers", "Gutierrez", "Ortiz", "Morgan", "Cooper",
+    "Peterson", "Bailey", "Reed", "Kelly", "Howard", "Ramos", "Kim", "Cox", "Ward", "Richardson",
+    "Gabaree", "Patel", "Chen", "Wang", "Li", "Zhang", "Liu", "Singh", "Kumar", "Okafor",
+    "Nakamura", "Park", "Choi", "Ng", "O", "Wu", "De La Cruz", "O'Brien", "Van der Berg", "Smith-Jones")
+
+# Share of users that get each profile type
+TYPES = (
+    (UserProfile.STUDENT, 0.85),
+    (UserProfile.TEACHER, 0.06),
+    (UserProfile.COUNSELOR, 0.01),
+    (UserProfile.STAFF, 0.03),
+    (UserProfile.ALUMNUS, 0.05))
+
+STAFF_TITLES = ("Office", "Library", "Nurse", "Athletics", "Technology", "Cafeteria", "Security")
+
+# Fields of each profile type filled in by profile_fields
+PROFILE_FIELDS = {
+    UserProfile.STUDENT: ("student_id", "graduation_year", "counselor_id"),
+    UserProfile.ALUMNUS: ("graduation_year",),
+    UserProfile.STAFF: ("title",)}
+PROFILE_FIELDS.update({profile_type: () for profile_type in UserProfile.TYPES if profile_type not in PROFILE_FIELDS})
+
+# Weights of request statuses
+STATUSES = ((ClubGroupRequest.PENDING, 0.6), (ClubGroupRequest.APPROVED, 0.25), (ClubGroupRequest.REJECTED, 0.15))
+
+# Share of friendships that are still unconfirmed requests
+UNCONFIRMED = 0.05
+
+Dataset = collections.namedtuple("Dataset", ("users", "groups", "memberships", "friendships", "requests"))
+
+
+def zipf(count, exponent=1.0) -> list:
+    """Get weights that make earlier items much more common."""
+
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def counts(users) -> dict:
+    """Split a number of users across profile types by their shares.
+
+    Every type gets at least one user so that every profile type is
+    present however small the dataset is.
+    """
+
+    result = {profile_type: max(1, int(users * share)) for profile_type, share in TYPES[1:]}
+    result[UserProfile.STUDENT] = max(1, users - sum(result.values()))
+    return result
+
+
+def names(rng, count):
+    """Yield realistic first and last name pairs."""
+
+    first_weights = zipf(len(FIRST_NAMES))
+    last_weights = zipf(len(LAST_NAMES), 0.8)
+    first_names = rng.choices(FIRST_NAMES, first_weights, k=count)
+    last_names = rng.choices(LAST_NAMES, last_weights, k=count)
+    yield from zip(first_names, last_names)
+
+
+def timestamp():
+    """Get the current time as the database stores it."""
+
+    return connection.ops.adapt_datetimefield_value(timezone.now())
+
+
+def next_id(model) -> int:
+    """Get the first primary key after the rows already in a table."""
+
+    return (model._base_manager.aggregate(id=Max("pk"))["id"] or 0) + 1
+
+
+def insert(model, fields, rows, batch_size=10000) -> int:
+    """Insert tuples of values for the named fields of a model.
+
+    Rows go straight to the cursor in batches with executemany, which
+    skips building a model instance and preparing every value, so the
+    values must already be what the database expects. Returns the
+    number of rows inserted.
+    """
+
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(model._meta.get_field(field).column) for field in fields)
+    sql = (f"INSERT INTO {quote(model._meta.db_table)} ({columns}) "
+           f"VALUES ({', '.join(['%s'] * len(fields))})")
+    count = 0
+    rows = iter(rows)
+    with connection.cursor() as cursor:
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            cursor.executemany(sql, batch)
+            count += len(batch)
+    return count
+
+
+def reset_sequences(*models):
+    """Move primary key sequences past rows inserted with explicit keys."""
+
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+def profile_fields(rng, profile_type, student_id, counselor_ids, year) -> tuple:
+    """Get values for the fields of a profile type listed in PROFILE_FIELDS."""
+
+    if profile_type == UserProfile.STUDENT:
+        counselor_id = rng.choice(counselor_ids) if counselor_ids else None
+        return str(student_id), year + rng.randrange(4), counselor_id
+    if profile_type == UserProfile.ALUMNUS:
+        return year - 1 - rng.randrange(30),
+    if profile_type == UserProfile.STAFF:
+        return rng.choice(STAFF_TITLES),
+    return ()
+
+
+def create_users(rng, count, year=2019) -> dict:
+    """Create users of every profile type, returning their IDs by type.
+
+    Usernames are picked by the same rules as for an imported roster,
+    checked against every username already taken, so common names
+    collide and fall back to longer and numbered usernames. Each user
+    gets statistics and the login permission like an imported one.
+    """
+
+    people = [(profile_type, *name) for profile_type, amount in counts(count).items() for name in names(rng, amount)]
+    taken = set(User.objects.values_list("username", flat=True))
+    numbered = {}
+    usernames = [rules.next_username(first_name, last_name, taken, numbered) for _, first_name, last_name in people]
+    permission = Permission.objects.get(codename="can_login")
+    password = UNUSABLE_PASSWORD_PREFIX + "synthetic"
+    now = timestamp()
+    ctypes = {
+        profile_type: ContentType.objects.get_for_model(model, for_concrete_model=False).id
+        for profile_type, model in UserProfile.concrete.items()}
+
+    user_id = next_id(User)
+    profile_id = next_id(UserProfile)
+    student_id = int(StudentUserProfile.objects.aggregate(id=Max("student_id"))["id"] or 99999) + 1
+    users, profiles = [], []
+    children = collections.defaultdict(list)
+    ids = collections.defaultdict(list)
+
+    # Counselors come before students so students can be assigned one
+    for (profile_type, first_name, last_name), username in zip(people, usernames):
+        users.append((user_id, password, False, username, first_name, last_name, f"{username}@example.com",
+                      False, True, now))
+        profiles.append((profile_id, ctypes[profile_type], now, now, user_id))
+        children[profile_type].append((profile_id, *profile_fields(
+            rng, profile_type, student_id, ids[UserProfile.COUNSELOR], year)))
+        ids[profile_type].append(user_id)
+        student_id += profile_type == UserProfile.STUDENT
+        user_id += 1
+        profile_id += 1
+
+    insert(User, ("id", "password", "is_superuser", "username", "first_name", "last_name", "email", "is_staff",
+                  "is_active", "date_joined"), users)
+    insert(UserStatistics, ("user_id", "login_count"), ((user[0], 0) for user in users))
+    insert(User.user_permissions.through, ("user_id", "permission_id"), ((user[0], permission.id) for user in users))
+    insert(UserProfile, ("id", "polymorphic_ctype_id", "creation_time", "modification_time", "user_id"), profiles)
+    for profile_type, rows in children.items():
+        insert(UserProfile.concrete[profile_type], ("userprofile_ptr_id", *PROFILE_FIELDS[profile_type]), rows)
+    reset_sequences(auth.User, UserProfile)
+    return ids
+
+
+def create_groups(rng, count) -> list:
+    """Create groups spread across every concrete group type."""
+
+    types = sorted(Group.concrete)
+    by_type = collections.defaultdict(list)
+    for i in range(max(count, len(types))):
+        group_type = types[i % len(types)]
+        by_type[group_type].append(Group.concrete[group_type](
+            name=f"{group_type}{i}", title=f"{group_type.capitalize()} {i}", description="Synthetic group",
+            hidden=rng.random() < 0.05))
+    created = []
+    for group_type, groups in by_type.items():
+        created.extend(bulk_create_polymorphic(Group.concrete[group_type], groups, key="name"))
+    return created
+
+
+def create_memberships(rng, user_ids, group_ids, per_user) -> int:
+    """Add each user to a varying number of groups, some with extra roles.
+
+    Groups are picked with a skewed distribution so that a few groups
+    are large and most are small.
+    """
+
+    weights = zipf(len(group_ids), 0.6)
+    now = timestamp()
+    memberships = []
+    for user_id in user_ids:
+        for group_id in sorted(set(rng.choices(group_ids, weights, k=rng.randint(0, 2 * per_user)))):
+            roles = GroupMembership.MEMBER
+            if rng.random() < 0.05:
+                roles |= GroupMembership.OFFICER
+            memberships.append((now, now, user_id, group_id, roles))
+    return insert(GroupMembership, ("creation_time", "modification_time", "user_id", "group_id", "roles"), memberships)
+
+
+def create_friendships(rng, user_ids, per_user) -> int:
+    """Create friendships with about per_user friends each on average.
+
+    Users join in a random order and befriend per_user / 2 earlier
+    users, picked in proportion to how many friends they already have
+    with an occasional uniform pick, so a few users end up with very
+    many friends and most have only a few.
+    """
+
+    order = list(user_ids)
+    rng.shuffle(order)
+    edges = max(1, per_user // 2)
+    endpoints = []
+    pairs = set()
+    for i, user_id in enumerate(order):
+        chosen = set()
+        while len(chosen) < min(edges, i):
+            if not endpoints or rng.random() < 0.1:
+                chosen.add(order[rng.randrange(i)])
+            else:
+                chosen.add(rng.choice(endpoints))
+        for other in chosen:
+            pairs.add(Friendship.ordered(user_id, other))
+            endpoints.append(user_id)
+            endpoints.append(other)
+
+    now = timestamp()
+    friendships = [(now, now, a, b, rng.choice((a, b)), rng.random() >= UNCONFIRMED) for a, b in sorted(pairs)]
+    return insert(Friendship, ("creation_time", "modification_time", "a_id", "b_id", "requester_id", "confirmed"),
+                  friendships)
+
+
+def create_requests(rng, count, student_ids, teacher_ids) -> int:
+    """Create club group requests with one or two sponsors each."""
+
+    statuses = [status for status, _ in STATUSES]
+    weights = [share for _, share in STATUSES]
+    ClubGroupRequest.objects.bulk_create(ClubGroupRequest(
+        user_id=rng.choice(student_ids),
+        name=f"request{i}",
+        title=f"Requested club {i}",
+        description="Synthetic request",
+        status=rng.choices(statuses, weights)[0]) for i in range(count))
+
+    sponsorships = []
+    for request_id, status in ClubGroupRequest.objects.order_by("id").values_list("id", "status"):
+        for sponsor_id in rng.sample(teacher_ids, min(rng.randint(1, 2), len(teacher_ids))):
+            verified = status != ClubGroupRequest.PENDING or rng.random() < 0.5
+            sponsorships.append(ClubGroupRequestSponsorship(
+                request_id=request_id, sponsor_id=sponsor_id, verified=verified))
+    ClubGroupRequestSponsorship.objects.bulk_create(sponsorships)
+    return count
+
+
+def generate(users=3300, groups=300, memberships=5, friendships=6, requests=50, seed=0, mutual=True) -> Dataset:
+    """Fill the database with a deterministic synthetic dataset.
+
+    Returns the number of rows created of each kind. Mutual friend
+    counts are rebuilt afterwards since bulk inserts skip the signals
+    that maintain them, unless mutual is false.
+    """
+
+    rng = random.Random(seed)
+    with transaction.atomic():
+        ids = create_users(rng, users)
+        everyone = sorted(itertools.chain.from_iterable(ids.values()))
+        students = ids[UserProfile.STUDENT]
+        group_ids = [group.pk for group in create_groups(rng, groups)]
+        membership_count = create_memberships(rng, everyone, group_ids, memberships)
+        friendship_count = create_friendships(rng, students, friendships)
+        request_count = create_requests(rng, requests, students, ids[UserProfile.TEACHER])
+    if mutual:
+        friends.rebuild()
+    return Dataset(len(everyone), len(group_ids), membership_count, friendship_count, request_count)
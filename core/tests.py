@@ -1,3 +1,625 @@
+from django.contrib.auth import BACKEND_SESSION_KEY, authenticate
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password
+from django.contrib.auth.models import update_last_login
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection, transaction
+from django.http import HttpResponse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from unittest import mock
 
-# Create your tests here.
+import csv
+import io
+import json
+import os
+import pstats
+import tempfile
+
+from anduril.settings.oidc import CustomScopeClaims
+from groups.models import ClubGroupRequest
+from home.models import Friendship
+from lib import pagination, polymorphic, profiling, testing
+from .models import User, UserProfile, UserStatistics
+from . import benchmark, logins, roster, snapshots, synthetic
+
+
+class SnapshotTest(TestCase):
+    """Check that profile snapshots are cached and invalidated."""
+
+    def setUp(self):
+        """Create a student."""
+
+        snapshots.cache().clear()
+        self.user = User.objects.create_user(
+            username="student",
+            first_name="Sean",
+            last_name="Gabaree",
+            type=UserProfile.STUDENT,
+            profile__student_id="123456")
+
+    def test_cached(self):
+        """A snapshot is served from the cache once built."""
+
+        snapshot = snapshots.get(User.objects.get(pk=self.user.pk))
+        self.assertEqual(snapshot.type, UserProfile.STUDENT)
+        self.assertEqual(snapshot.student_id, "123456")
+        with self.assertNumQueries(0):
+            self.assertEqual(snapshots.cached(self.user.pk), snapshot)
+
+    def test_invalidated(self):
+        """Saving the user or profile drops the snapshot."""
+
+        snapshots.get(User.objects.get(pk=self.user.pk))
+        profile = UserProfile.objects.get(user=self.user)
+        profile.display_first_name = "Shaun"
+        profile.save()
+        self.assertIsNone(snapshots.cached(self.user.pk))
+        self.assertEqual(snapshots.get(User.objects.get(pk=self.user.pk)).full_name, "Shaun Gabaree")
+
+        self.user.last_name = "Gabarée"
+        self.user.save()
+        self.assertIsNone(snapshots.cached(self.user.pk))
+
+    def test_invalidated_on_commit(self):
+        """A snapshot cached before the transaction commits is dropped again."""
+
+        with mock.patch.object(transaction, "on_commit") as on_commit:
+            self.user.save()
+        snapshots.cache().set(snapshots.KEY.format(self.user.pk), snapshots.build(self.user))
+        on_commit.call_args[0][0]()
+        self.assertIsNone(snapshots.cached(self.user.pk))
+
+    def test_invalidated_across_workers(self):
+        """Dropping a snapshot reaches the cache of another worker."""
+
+        source = f"from core import snapshots\nprint(snapshots.cached({self.user.pk}) is not None)"
+        with testing.shared_caches(snapshots.CACHE_ALIAS) as env:
+            snapshots.get(User.objects.get(pk=self.user.pk))
+            self.assertEqual(testing.run_worker(source, env), "True")
+            self.user.save()
+            self.assertEqual(testing.run_worker(source, env), "False")
+
+    def test_oidc_claims(self):
+        """Claims for every scope are built with one query, then from the cache."""
+
+        token = mock.Mock(user=User.objects.get(pk=self.user.pk), scope=["profile", "id", "email"])
+        with self.assertNumQueries(1):
+            claims = CustomScopeClaims(token).create_response_dic()
+        self.assertEqual(claims["type"], UserProfile.STUDENT)
+        self.assertEqual(claims["student_id"], "123456")
+        self.assertEqual(claims["first_name"], "Sean")
+        token.user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(CustomScopeClaims(token).create_response_dic(), claims)
+
+
+class RosterTest(TestCase):
+    """Check that rosters create and update users and profiles in bulk."""
+
+    def setUp(self):
+        """Import a small roster."""
+
+        self.counts = roster.import_roster([
+            self.student("changed", "Sean", "1"),
+            self.student("graduated", "Grace", "2"),
+            self.student("", "Ursula", "3"),
+            {"username": "teacher", "type": UserProfile.TEACHER, "first_name": "Tom", "last_name": "Teach"}])
+
+    @staticmethod
+    def student(username, first_name, student_id, **fields):
+        """Make the roster record of a student."""
+
+        return dict({
+            "username": username,
+            "type": UserProfile.STUDENT,
+            "first_name": first_name,
+            "last_name": "Gabaree",
+            "profile__student_id": student_id,
+            "profile__graduation_year": "2020"}, **fields)
+
+    def assertAligned(self):
+        """Every parent profile row has exactly the child row of its type."""
+
+        parents = UserProfile.objects.non_polymorphic()
+        for profile_type, model in UserProfile.concrete.items():
+            ctype = ContentType.objects.get_for_model(model, for_concrete_model=False)
+            self.assertEqual(
+                set(parents.filter(polymorphic_ctype=ctype).values_list("pk", "user_id")),
+                set(model.objects.non_polymorphic().values_list("pk", "user_id")), profile_type)
+        self.assertEqual(parents.count(), User.objects.count())
+        self.assertEqual(UserStatistics.objects.count(), User.objects.count())
+
+    def test_import(self):
+        """New users get their profile, statistics, and login permission."""
+
+        self.assertEqual(self.counts, {"created": 4, "updated": 0, "unchanged": 0})
+        self.assertAligned()
+        user = User.objects.get(profile__studentuserprofile__student_id="3")
+        self.assertEqual(user.username, "urgabare")
+        self.assertEqual(user.profile.graduation_year, 2020)
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(User.objects.filter(user_permissions__codename="can_login").count(), 4)
+
+    def test_reimport(self):
+        """Changed, retyped, and new rows are updated in place."""
+
+        counts = roster.import_roster([
+            self.student("changed", "Shaun", "1"),
+            dict(self.student("graduated", "Grace", ""), type=UserProfile.ALUMNUS, profile__student_id=""),
+            self.student("", "Ursula", "3"),
+            {"username": "teacher", "type": UserProfile.TEACHER, "first_name": "Tom", "last_name": "Teach"},
+            self.student("", "Nina", "4")])
+        self.assertEqual(counts, {"created": 1, "updated": 2, "unchanged": 2})
+        self.assertAligned()
+        self.assertEqual(User.objects.get(username="changed").first_name, "Shaun")
+        graduated = User.objects.get(username="graduated")
+        self.assertEqual(graduated.profile.type, UserProfile.ALUMNUS)
+        self.assertEqual(graduated.profile.graduation_year, 2020)
+        self.assertEqual(User.objects.filter(profile__studentuserprofile__student_id="4").get().username, "nigabare")
+
+    def test_reimport_without_usernames(self):
+        """Rows without a username are matched by student ID or email."""
+
+        records = [
+            {"type": UserProfile.TEACHER, "first_name": "Tina", "last_name": "Teach", "email": "tina@example.com"},
+            {"type": UserProfile.STAFF, "first_name": "Sam", "last_name": "Staff", "email": "sam@example.com"},
+            self.student("", "Nina", "4"),
+            self.student("", "Nina", "4", profile__graduation_year="2021")]
+        counts = roster.import_roster(records)
+        self.assertEqual(counts, {"created": 3, "updated": 0, "unchanged": 0})
+        self.assertEqual(User.objects.get(email="tina@example.com").username, "titeach")
+        self.assertEqual(User.objects.get(profile__studentuserprofile__student_id="4").profile.graduation_year, 2021)
+
+        counts = roster.import_roster(records)
+        self.assertEqual(counts, {"created": 0, "updated": 0, "unchanged": 3})
+        self.assertEqual(User.objects.count(), 7)
+        self.assertAligned()
+
+    def test_unkeyed(self):
+        """Rows without a username, student ID, or email are rejected."""
+
+        with self.assertRaisesRegex(ValueError, "Tina Teach needs a username, student ID, or email"):
+            roster.import_roster([{"type": UserProfile.TEACHER, "first_name": "Tina", "last_name": "Teach"}])
+
+    def test_queries(self):
+        """A batch takes the same number of queries regardless of its size."""
+
+        def queries(first, size):
+            with CaptureQueriesContext(connection) as context:
+                roster.import_roster(self.student("", "Student", str(i)) for i in range(first, first + size))
+            return len(context)
+
+        self.assertEqual(queries(100, 5), queries(200, 50))
+
+    def test_bulk_create_polymorphic(self):
+        """Parent and child rows of bulk created profiles line up."""
+
+        model = UserProfile.concrete[UserProfile.TEACHER]
+        users = [User.objects.create(username=f"bulk{i}") for i in range(3)]
+        profiles = polymorphic.bulk_create_polymorphic(
+            model, (model(user_id=user.id) for user in users), key="user_id")
+        self.assertEqual([profile.user_id for profile in profiles], [user.id for user in users])
+        self.assertAligned()
+        for profile in profiles:
+            self.assertEqual(UserProfile.objects.get(user_id=profile.user_id).pk, profile.pk)
+
+
+class HashPasswordsTest(TestCase):
+    """Check that roster passwords are hashed in order by a pool of workers."""
+
+    def setUp(self):
+        """Write a roster with a password column."""
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "roster.csv")
+        self.rows = [[f"student{i}", f"password{i}"] for i in range(6)]
+        with open(self.path, "w", newline="") as file:
+            csv.writer(file).writerows([["username", "password"], *self.rows])
+
+    def tearDown(self):
+        """Remove the roster and its hashed copy."""
+
+        self.directory.cleanup()
+
+    def test_pool(self):
+        """Chunks hashed by two workers are written back onto their rows."""
+
+        output = io.StringIO()
+        call_command("hashpasswords", self.path, workers=2, chunk_size=4, verbosity=2, stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[:2], ["Hashed 4 rows", "Hashed 6 rows"])
+        self.assertRegex(lines[2], r"^Hashed 6 rows in [0-9.]+s \([0-9.]+ rows/sec\) using 2 worker\(s\)$")
+
+        with open(os.path.join(self.directory.name, "roster.hashed.csv"), newline="") as file:
+            header, *rows = csv.reader(file)
+        self.assertEqual(header, ["username", "password"])
+        self.assertEqual([row[0] for row in rows], [row[0] for row in self.rows])
+        for (_, password), (_, hashed) in zip(self.rows, rows):
+            self.assertTrue(check_password(password, hashed))
+
+    def test_missing_column(self):
+        """A password column that isn't in the header is an error."""
+
+        with self.assertRaisesRegex(CommandError, "Cannot find column 'secret'"):
+            call_command("hashpasswords", self.path, name="secret")
+
+
+class LoginStatisticsTest(TestCase):
+    """Check that logins are counted atomically and in bulk."""
+
+    def setUp(self):
+        """Create a couple of students."""
+
+        self.users = [
+            User.objects.create_user(username=f"student{i}", type=UserProfile.STUDENT, profile__student_id=str(i))
+            for i in range(2)]
+
+    def test_record(self):
+        """Logins increment the count and set the first login once."""
+
+        first = timezone.now()
+        logins.record(self.users[0].pk, first)
+        logins.record(self.users[0].pk, timezone.now())
+        statistics = UserStatistics.objects.get(user=self.users[0])
+        self.assertEqual(statistics.login_count, 2)
+        self.assertEqual(statistics.first_login, first)
+
+    def test_buffer(self):
+        """Buffered logins are written in a single update."""
+
+        buffer = logins.LoginBuffer(interval=60)
+        first = timezone.now()
+        buffer.add(self.users[0].pk, first)
+        buffer.add(self.users[0].pk, timezone.now())
+        buffer.add(self.users[1].pk, first)
+        # The update, plus the savepoint
+        with self.assertNumQueries(3):
+            buffer.flush()
+
+        counts = dict(UserStatistics.objects.values_list("user_id", "login_count"))
+        self.assertEqual(counts, {self.users[0].pk: 2, self.users[1].pk: 1})
+        self.assertEqual(UserStatistics.objects.get(user=self.users[1]).first_login, first)
+
+    def test_failed_flush(self):
+        """Buffered logins are kept when writing them fails."""
+
+        buffer = logins.LoginBuffer(interval=60)
+        first = timezone.now()
+        buffer.add(self.users[0].pk, first)
+        with mock.patch.object(logins, "apply", side_effect=DatabaseError("unavailable")):
+            with self.assertRaises(DatabaseError):
+                buffer.flush()
+        buffer.add(self.users[0].pk, timezone.now())
+        buffer.flush()
+        statistics = UserStatistics.objects.get(user=self.users[0])
+        self.assertEqual((statistics.login_count, statistics.first_login), (2, first))
+
+    def test_apply_batches(self):
+        """Large flushes are split to stay under the parameter limit."""
+
+        users = [User.objects.create(username=f"user{i}") for i in range(400)]
+        counts = {user.pk: i + 1 for i, user in enumerate(users)}
+        first = timezone.now()
+        parameters = [None] * logins.FLUSH_PARAMETERS_PER_USER
+        size = min(logins.FLUSH_BATCH_SIZE, connection.ops.bulk_batch_size(parameters, users))
+        batches = (len(users) + size - 1) // size
+        with self.assertNumQueries(batches):
+            logins.apply(counts, {user.pk: first for user in users})
+        self.assertEqual(dict(UserStatistics.objects.filter(user__in=users).values_list("user_id", "login_count")), counts)
+
+
+class LoginQueryTest(TestCase):
+    """Benchmark the number of queries a login and user save cost."""
+
+    def setUp(self):
+        """Create a staff member that can log in."""
+
+        self.user = User.objects.create_user(username="student", type=UserProfile.STUDENT, profile__student_id="1")
+        self.user.set_password("password")
+        self.user.is_staff = True
+        self.user.save()
+
+    def test_login_queries(self):
+        """Posting credentials to the login page."""
+
+        # User, session create, last login, statistics, session update
+        with self.assertNumQueries(10):
+            response = self.client.post(reverse("home:login"), {"username": "student", "password": "password"})
+        self.assertRedirects(response, reverse("home:index"), fetch_redirect_response=False)
+
+    def test_login_next(self):
+        """Logging in continues to a local next page but not an external one."""
+
+        response = self.client.post(
+            reverse("home:login"), {"username": "student", "password": "password", "next": "/openid/authorize/?a=1"})
+        self.assertRedirects(response, "/openid/authorize/?a=1", fetch_redirect_response=False)
+        response = self.client.post(
+            reverse("home:login"), {"username": "student", "password": "password", "next": "http://evil.com/"})
+        self.assertRedirects(response, reverse("home:index"), fetch_redirect_response=False)
+
+    def test_previous_backend_session(self):
+        """Sessions logged in by the stock model backend stay logged in."""
+
+        self.client.force_login(self.user, backend="django.contrib.auth.backends.ModelBackend")
+        response = self.client.get(reverse("home:index"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user, self.user)
+        self.assertEqual(self.client.session[BACKEND_SESSION_KEY], "core.backends.ProfileModelBackend")
+
+    def test_failed_login_hashes_once(self):
+        """A wrong password is only checked by one backend."""
+
+        with mock.patch("django.contrib.auth.hashers.PBKDF2PasswordHasher.encode", autospec=True,
+                        side_effect=PBKDF2PasswordHasher.encode) as encode:
+            self.assertIsNone(authenticate(username="student", password="wrong"))
+        self.assertEqual(encode.call_count, 1)
+
+    def test_last_login_queries(self):
+        """Updating the last login doesn't save the profile or statistics."""
+
+        user = User.objects.with_profile().get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            update_last_login(None, user)
+
+    def test_save_queries(self):
+        """Only the changed columns of loaded members are written."""
+
+        user = User.objects.with_profile().get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            user.save()
+
+        user.profile.display_first_name = "Shaun"
+        with CaptureQueriesContext(connection) as context:
+            user.save()
+        self.assertEqual(len(context), 2)
+        self.assertIn("core_userprofile", context[1]["sql"])
+        self.assertEqual(UserProfile.objects.get(user=user).first_name, "Shaun")
+
+
+class SyntheticTest(TestCase):
+    """Check that synthetic datasets are complete and deterministic."""
+
+    def test_generate(self):
+        """Every profile type is created and common names collide."""
+
+        dataset = synthetic.generate(users=300, groups=10, requests=5, seed=1)
+        self.assertEqual(dataset.users, User.objects.count())
+        self.assertEqual(dataset.friendships, Friendship.objects.count())
+        self.assertEqual({profile.type for profile in UserProfile.objects.all()}, set(UserProfile.TYPES))
+        self.assertTrue(User.objects.filter(username__regex=r"[0-9]$").exists())
+        self.assertEqual(ClubGroupRequest.objects.count(), 5)
+
+        user = User.objects.with_profile().filter(profile__studentuserprofile__isnull=False).first()
+        self.assertTrue(user.has_perm("home.can_login"))
+        self.assertFalse(user.has_usable_password())
+        self.assertIsNotNone(user.profile.counselor_id)
+
+        # New users still get fresh primary keys
+        User.objects.create_user(username="student", type=UserProfile.STUDENT, profile__student_id="1")
+
+    def test_deterministic(self):
+        """The same seed gives the same usernames."""
+
+        with transaction.atomic():
+            synthetic.generate(users=100, groups=5, requests=0, seed=2, mutual=False)
+            first = list(User.objects.order_by("id").values_list("username", "profile__polymorphic_ctype"))
+            transaction.set_rollback(True)
+        synthetic.generate(users=100, groups=5, requests=0, seed=2, mutual=False)
+        self.assertEqual(list(User.objects.order_by("id").values_list("username", "profile__polymorphic_ctype")), first)
+
+
+class BenchmarkTest(TestCase):
+    """Check the routes and regression comparison of benchmarks."""
+
+    @staticmethod
+    def result(queries=3, p95=10.0):
+        """Make the benchmark result of a view."""
+
+        return {"status": 200, "queries": queries, "db_ms": 1.0, "p50_ms": p95, "p95_ms": p95}
+
+    def test_routes(self):
+        """Every route but logout gets a concrete path."""
+
+        paths = benchmark.routes()
+        self.assertIn("", paths)
+        self.assertIn("groups/create/club", paths)
+        self.assertIn("api/users/export.ndjson", paths)
+        self.assertNotIn("logout/", paths)
+        for path in paths:
+            self.assertNotRegex(path, r"[()^$\\?]")
+
+    def test_percentile(self):
+        """Percentiles are the nearest rank of the sorted values."""
+
+        values = list(range(20, 0, -1))
+        self.assertEqual(benchmark.percentile(values, 0.95), 19)
+        self.assertEqual(benchmark.percentile(values, 0.5), 10)
+        self.assertEqual(benchmark.percentile(values, 0), 1)
+        self.assertEqual(benchmark.percentile([5.0], 0.95), 5.0)
+
+    def test_compare(self):
+        """Extra queries, new errors, and slower views beyond the slack regress."""
+
+        error = {"status": 500, "error": "ValueError: broken"}
+        baseline = {
+            "queries": self.result(), "noise": self.result(), "slower": self.result(p95=100.0),
+            "error": self.result(), "fixed": error, "same": self.result(), "removed": self.result()}
+        results = {
+            "queries": self.result(queries=4), "noise": self.result(p95=14.0), "slower": self.result(p95=130.0),
+            "error": error, "fixed": self.result(queries=50), "same": self.result(), "added": self.result(queries=99)}
+        self.assertEqual(benchmark.compare(baseline, results), [
+            "error: ValueError: broken", "queries: 3 -> 4 queries", "slower: p95 100.0ms -> 130.0ms"])
+        self.assertEqual(benchmark.compare(baseline, results, queries=1, latency=0.5), ["error: ValueError: broken"])
+        self.assertIn("noise: p95 10.0ms -> 14.0ms", benchmark.compare(baseline, results, slack=2.0))
+
+
+class ProfilingTest(TestCase):
+    """Check that opted in requests are profiled."""
+
+    def setUp(self):
+        """Create a student."""
+
+        self.user = User.objects.create_user(username="student", type=UserProfile.STUDENT, profile__student_id="1")
+        self.client.force_login(self.user)
+
+    def test_disabled(self):
+        """Requests aren't profiled unless they opt in."""
+
+        response = self.client.get(reverse("home:index"), HTTP_X_PROFILE="1")
+        self.assertNotIn("Server-Timing", response)
+
+    def test_header(self):
+        """Staff can profile a request with the header."""
+
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        with self.assertLogs("lib.profiling") as logs:
+            response = self.client.get(reverse("groups:index"), HTTP_X_PROFILE="1")
+        self.assertIn("template;dur=", response["Server-Timing"])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["path"], reverse("groups:index"))
+        self.assertGreater(record["queries"], 0)
+        self.assertGreater(record["template_ms"], 0)
+
+    def test_duplicates(self):
+        """Queries repeated with the same parameters are reported."""
+
+        recorder = profiling.Recorder()
+        with profiling.recording(recorder):
+            list(User.objects.filter(pk=self.user.pk))
+            list(User.objects.filter(pk=self.user.pk))
+            list(User.objects.filter(pk=0))
+        self.assertEqual(len(recorder.queries), 3)
+        self.assertEqual(list(recorder.duplicates().values()), [2])
+        self.assertIn('3 queries, 1 duplicate', profiling.server_timing(recorder, 0.1))
+
+    def test_dump(self):
+        """Sampled requests are dumped as cProfile stats."""
+
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_DIRECTORY=directory):
+                with self.assertLogs("lib.profiling"):
+                    response = self.client_class().get(reverse("home:login"))
+            self.assertIn("sql;dur=", response["Server-Timing"])
+            path, = os.listdir(directory)
+            pstats.Stats(os.path.join(directory, path))
+
+
+class NPlusOneTest(testing.NPlusOneMixin, TestCase):
+    """Check that repeated query shapes are caught."""
+
+    def setUp(self):
+        """Create a few students."""
+
+        for i in range(3):
+            User.objects.create_user(username=f"student{i}", type=UserProfile.STUDENT, profile__student_id=str(i))
+
+    def test_shape(self):
+        """Literals and parameter lists don't change the shape."""
+
+        self.assertEqual(
+            testing.shape('SELECT "a" FROM "t" WHERE "id" IN (%s, %s) AND "b" = 1'),
+            testing.shape('SELECT "a"  FROM "t" WHERE "id" IN (%s) AND "b" = 23'))
+
+    def test_loop(self):
+        """Loading profiles in a loop raises with the offending line."""
+
+        with self.assertRaises(testing.NPlusOneError) as context:
+            with testing.watch():
+                [user.profile.type for user in User.objects.all()]
+        self.assertIn("3 queries of the same shape", str(context.exception))
+        self.assertIn("user.profile.type", str(context.exception))
+
+        with testing.watch():
+            [user.profile.type for user in User.objects.with_profile()]
+
+    def test_detector(self):
+        """Stacks are only taken for new shapes, and a zero threshold flags every shape."""
+
+        detector = testing.Detector(threshold=0)
+        with mock.patch.object(testing, "stack", wraps=testing.stack) as stack:
+            with profiling.recording(detector):
+                [user.profile.type for user in User.objects.all()]
+        self.assertEqual(stack.call_count, len(detector.stacks))
+        self.assertLess(len(detector.stacks), len(detector.queries))
+        self.assertEqual(len(detector.problems()), len(detector.stacks))
+        self.assertEqual(testing.watch(threshold=0).threshold, 0)
+
+    def test_warn(self):
+        """Watches that aren't strict only warn."""
+
+        with self.assertWarns(testing.NPlusOneWarning):
+            with testing.watch(strict=False):
+                [user.profile.type for user in User.objects.all()]
+
+    def test_client(self):
+        """Requests through the client are watched."""
+
+        def render(request, template, context):
+            return HttpResponse(", ".join(user.profile.type for user in User.objects.all()))
+
+        self.client.force_login(User.objects.get(username="student0"))
+        self.assertEqual(self.client.get(reverse("groups:index")).status_code, 200)
+        with mock.patch("groups.views.student.render", render):
+            with self.assertRaises(testing.NPlusOneError):
+                self.client.get(reverse("groups:index"))
+
+
+class UserAdminTest(TestCase):
+    """Check that the user changelist loads profile types in bulk."""
+
+    def setUp(self):
+        """Create a superuser and a mix of profiles."""
+
+        self.admin = User.objects.create_user(
+            username="admin", type=UserProfile.STAFF, profile__title="Office", is_staff=True, is_superuser=True)
+        self.client.force_login(self.admin)
+        for i in range(4):
+            User.objects.create_user(
+                username=f"student{i}", type=UserProfile.STUDENT,
+                profile__student_id=str(i), profile__graduation_year=2020 + i % 2)
+        User.objects.create_user(username="alumnus", type=UserProfile.ALUMNUS, profile__graduation_year=2020)
+        User.objects.create_user(username="teacher", type=UserProfile.TEACHER)
+
+    def changelist(self, **params):
+        """Get the usernames on the changelist and its query count."""
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("admin:core_user_changelist"), params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(user.username for user in response.context["cl"].result_list), len(context)
+
+    def test_queries(self):
+        """The query count doesn't grow with the number of rows."""
+
+        _, before = self.changelist()
+        for i in range(4, 20):
+            User.objects.create_user(username=f"student{i}", type=UserProfile.STUDENT, profile__student_id=str(i))
+        usernames, after = self.changelist()
+        self.assertEqual(after, before)
+        self.assertEqual(len(usernames), 23)
+
+        response = self.client.get(reverse("admin:core_user_changelist"))
+        self.assertContains(response, "Student")
+        self.assertContains(response, "Alumnus")
+
+    def test_type_filter(self):
+        """Users can be filtered by profile type."""
+
+        usernames, _ = self.changelist(type=UserProfile.STUDENT)
+        self.assertEqual(usernames, [f"student{i}" for i in range(4)])
+
+    def test_graduation_year_filter(self):
+        """Students and alumni can be filtered by graduation year."""
+
+        usernames, _ = self.changelist(graduation_year="2020")
+        self.assertEqual(usernames, ["alumnus", "student0", "student2"])
+
+    def test_paginator(self):
+        """Counts are exact where no estimate is available."""
+
+        self.assertIsNone(pagination.estimate_count(User.objects.all()))
+        self.assertEqual(pagination.EstimatedCountPaginator(User.objects.order_by("pk"), 10).count, 7)
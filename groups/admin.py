@@ -1,7 +1,7 @@
 from django.contrib import admin
 from polymorphic import admin as polymorphic_admin
 
-from . import models
+from . import models, review
 
 
 class ClubGroupAdmin(polymorphic_admin.PolymorphicChildModelAdmin):
@@ -31,9 +31,51 @@ class GroupAdmin(polymorphic_admin.PolymorphicParentModelAdmin):
         models.ExternalGroup)
 
 
+class ClubGroupRequestAdmin(admin.ModelAdmin):
+    """Review club requests with their sponsor verification counts."""
+
+    list_display = ("title", "name", "user", "status", "verified_count", "sponsor_count")
+    list_filter = ("status",)
+    list_select_related = ("user",)
+    actions = ("approve", "reject")
+
+    def get_queryset(self, request):
+        """Annotate sponsor counts rather than counting per row."""
+
+        return super().get_queryset(request).with_sponsor_counts()
+
+    def verified_count(self, obj):
+        """Number of sponsors that have verified."""
+
+        return obj.verified_count
+
+    def sponsor_count(self, obj):
+        """Number of sponsors on the request."""
+
+        return obj.sponsor_count
+
+    def approve(self, request, queryset):
+        """Create groups for the selected requests that are ready."""
+
+        groups = review.approve(list(queryset.values_list("id", flat=True)))
+        self.message_user(request, f"Approved {len(groups)} requests.")
+
+    def reject(self, request, queryset):
+        """Reject the selected pending requests."""
+
+        count = review.reject(list(queryset.values_list("id", flat=True)))
+        self.message_user(request, f"Rejected {count} requests.")
+
+    verified_count.admin_order_field = "verified_count"
+    sponsor_count.admin_order_field = "sponsor_count"
+    approve.short_description = "Approve selected requests"
+    reject.short_description = "Reject selected requests"
+
+
 # Register group admins
 admin.site.register(models.ClubGroup, ClubGroupAdmin)
 admin.site.register(models.AcademicGroup, AcademicGroupAdmin)
 admin.site.register(models.AdministrativeGroup, AdministrativeGroupAdmin)
 admin.site.register(models.ExternalGroup, ExternalGroupAdmin)
 admin.site.register(models.Group, GroupAdmin)
+admin.site.register(models.ClubGroupRequest, ClubGroupRequestAdmin)
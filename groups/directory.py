@@ -0,0 +1,93 @@
+"""Searchable, paginated directory of groups.
+
+The directory reads only the base group table, reporting each group's
+type from its content type rather than downcasting it, and pages with
+a cursor on the unique group name instead of an offset so that deep
+pages cost the same as the first and no count is needed. On PostgreSQL
+search uses the full text index over the name, title, and description
+that is created after migrating. Other databases fall back to
+substring matching.
+"""
+
+import base64
+import collections
+
+from django.db import connection
+
+from lib.polymorphic import content_type_ids, typed
+from .models import Group, SEARCH_DOCUMENT
+
+
+PAGE_SIZE = 25
+
+Page = collections.namedtuple("Page", ("groups", "next"))
+
+
+def encode_cursor(name):
+    """Encode the name of the last group on a page as a cursor."""
+
+    return base64.urlsafe_b64encode(name.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a cursor, returning None if it is malformed."""
+
+    try:
+        return base64.urlsafe_b64decode(cursor.encode()).decode()
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def search(queryset, query):
+    """Filter groups by a search query."""
+
+    if connection.vendor == "postgresql":
+        return queryset.extra(where=[f"{SEARCH_DOCUMENT} @@ plainto_tsquery('simple', %s)"], params=[query])
+    return (queryset.filter(name__icontains=query) |
+            queryset.filter(title__icontains=query) |
+            queryset.filter(description__icontains=query))
+
+
+def directory(type=None, hidden=False, query=None, cursor=None, size=PAGE_SIZE) -> Page:
+    """Get a page of the group directory.
+
+    Groups are filtered by type and hidden flag if they are not None,
+    and ordered by name. Each group is annotated with its type.
+    """
+
+    groups = typed(Group.objects.order_by("name"))
+
+    if type is not None:
+        groups = groups.filter(polymorphic_ctype_id=content_type_ids(Group.concrete).get(type))
+    if hidden is not None:
+        groups = groups.filter(hidden=hidden)
+    if query:
+        groups = search(groups, query)
+    if cursor:
+        after = decode_cursor(cursor)
+        if after is not None:
+            groups = groups.filter(name__gt=after)
+
+    # One extra row tells whether there is another page
+    groups = list(groups[:size+1])
+    if len(groups) > size:
+        return Page(groups[:size], encode_cursor(groups[size-1].name))
+    return Page(groups, None)
+
+
+def from_params(params, user) -> Page:
+    """Get a directory page from request parameters.
+
+    Only group managers may see hidden groups, by passing hidden as
+    true or any.
+    """
+
+    hidden = False
+    if params.get("hidden") in ("true", "any") and user.has_perm("groups.manage_groups"):
+        hidden = True if params["hidden"] == "true" else None
+
+    return directory(
+        type=params.get("type") or None,
+        hidden=hidden,
+        query=params.get("q", "").strip() or None,
+        cursor=params.get("cursor") or None)
@@ -8,7 +8,7 @@ class ClubGroupRequestFrom(ModelForm):
 
     class Meta:
         model = models.ClubGroupRequest
-        fields = ["sponsors"]
+        fields = ["name", "title", "description", "sponsors"]
 
 
 requests = {models.Group.CLUB: ClubGroupRequestFrom}
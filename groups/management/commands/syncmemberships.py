@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+import time
+
+from groups.sync import sync_memberships
+from lib.records import read_records
+
+
+class Command(BaseCommand):
+    """Synchronizes group memberships with a roster file in bulk."""
+
+    help = """\
+    This command makes group memberships match a CSV or JSONL export.
+    Each row needs a group name and a username, and may have roles as
+    space or comma separated role names (member by default). Every group
+    that appears in the file ends up with exactly the listed members;
+    groups not in the file are left alone. All changes are applied in a
+    single transaction.
+    """
+
+    def add_arguments(self, parser):
+        """Add arguments to the parser."""
+
+        parser.add_argument("roster", help="the CSV or JSONL membership file.")
+        parser.add_argument("-n", "--dry-run", dest="dry_run", action="store_true",
+                            help="Report the changes without applying them.")
+
+    def handle(self, roster, *args, dry_run=False, **kwargs):
+        """Run the actual command."""
+
+        start = time.perf_counter()
+        try:
+            counts = sync_memberships(read_records(roster), dry_run=dry_run)
+        except (KeyError, ValueError) as error:
+            raise CommandError(f"Invalid membership file: {error}")
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Created {counts['created']}, deleted {counts['deleted']}, updated {counts['updated']}, "
+            f"left {counts['unchanged']} unchanged in {elapsed:.2f}s{' (dry run)' if dry_run else ''}")
+        if counts["missing_groups"] or counts["missing_users"]:
+            self.stderr.write(
+                f"Skipped {counts['missing_groups']} unknown groups and {counts['missing_users']} unknown users")
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 08:22
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClubGroupRequest',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ClubGroupRequestSponsorship',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verified', models.BooleanField(default=False)),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='groups.ClubGroupRequest')),
+                ('sponsor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.User')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Group',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creation_time', models.DateTimeField(auto_now_add=True)),
+                ('modification_time', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=80, unique=True)),
+                ('title', models.CharField(max_length=80)),
+                ('description', models.TextField()),
+                ('hidden', models.BooleanField()),
+            ],
+            options={
+                'permissions': (('manage_groups', 'Can manage groups'), ('request_group', 'Can submit group application')),
+                'manager_inheritance_from_future': True,
+            },
+        ),
+        migrations.CreateModel(
+            name='GroupMembership',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creation_time', models.DateTimeField(auto_now_add=True)),
+                ('modification_time', models.DateTimeField(auto_now=True)),
+                ('roles', models.CharField(max_length=30)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='AcademicGroup',
+            fields=[
+                ('group_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='groups.Group')),
+            ],
+            options={
+                'manager_inheritance_from_future': True,
+            },
+            bases=('groups.group',),
+        ),
+        migrations.CreateModel(
+            name='AdministrativeGroup',
+            fields=[
+                ('group_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='groups.Group')),
+            ],
+            options={
+                'manager_inheritance_from_future': True,
+            },
+            bases=('groups.group',),
+        ),
+        migrations.CreateModel(
+            name='ClubGroup',
+            fields=[
+                ('group_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='groups.Group')),
+                ('sponsors', models.ManyToManyField(to='core.User')),
+            ],
+            options={
+                'manager_inheritance_from_future': True,
+            },
+            bases=('groups.group',),
+        ),
+        migrations.CreateModel(
+            name='ExternalGroup',
+            fields=[
+                ('group_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='groups.Group')),
+            ],
+            options={
+                'manager_inheritance_from_future': True,
+            },
+            bases=('groups.group',),
+        ),
+        migrations.AddField(
+            model_name='groupmembership',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='groups.Group'),
+        ),
+        migrations.AddField(
+            model_name='groupmembership',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.User'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='polymorphic_ctype',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='polymorphic_groups.group_set+', to='contenttypes.ContentType'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='users',
+            field=models.ManyToManyField(related_name='organizations', through='groups.GroupMembership', to='core.User'),
+        ),
+        migrations.AddField(
+            model_name='clubgrouprequest',
+            name='sponsors',
+            field=models.ManyToManyField(related_name='_clubgrouprequest_sponsors_+', through='groups.ClubGroupRequestSponsorship', to='core.User'),
+        ),
+        migrations.AddField(
+            model_name='clubgrouprequest',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.User'),
+        ),
+    ]
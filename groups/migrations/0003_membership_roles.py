@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 08:25
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+# Role flags as of this migration
+ROLES = {"member": 1, "officer": 2, "leader": 4, "sponsor": 8}
+MEMBER = 1
+
+# Rows per statement, which keeps SQLite under its parameter limit
+BATCH_SIZE = 500
+
+
+def convert(apps, schema_editor):
+    """Convert free text roles to flags and merge duplicate memberships.
+
+    Words in the old roles that aren't role names are dropped, and a
+    membership without any known role is a plain member. Duplicate
+    memberships of a user in a group are merged into the oldest with
+    the roles of all of them.
+    """
+
+    GroupMembership = apps.get_model("groups", "GroupMembership")
+    kept = {}
+    flags = {}
+    merged = []
+    for id, user, group, roles in (
+            GroupMembership.objects
+            .order_by("creation_time", "id")
+            .values_list("id", "user_id", "group_id", "roles")):
+        value = 0
+        for name in (roles or "").replace(",", " ").split():
+            value |= ROLES.get(name.lower(), 0)
+        key = (user, group)
+        if key in kept:
+            merged.append(id)
+        else:
+            kept[key] = id
+        flags[kept[key]] = flags.get(kept[key], 0) | value
+
+    for i in range(0, len(merged), BATCH_SIZE):
+        GroupMembership.objects.filter(pk__in=merged[i:i+BATCH_SIZE]).delete()
+    by_value = {}
+    for id, value in flags.items():
+        by_value.setdefault(value or MEMBER, []).append(id)
+    for value, ids in by_value.items():
+        for i in range(0, len(ids), BATCH_SIZE):
+            GroupMembership.objects.filter(pk__in=ids[i:i+BATCH_SIZE]).update(flags=value)
+
+
+def restore(apps, schema_editor):
+    """Convert flags back to space separated role names."""
+
+    GroupMembership = apps.get_model("groups", "GroupMembership")
+    for value in GroupMembership.objects.values_list("flags", flat=True).distinct():
+        names = " ".join(name for name, flag in sorted(ROLES.items(), key=lambda item: item[1]) if value & flag)
+        GroupMembership.objects.filter(flags=value).update(roles=names)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('groups', '0002_group_directory_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupmembership',
+            name='flags',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.RunPython(convert, restore),
+        migrations.RemoveField(
+            model_name='groupmembership',
+            name='roles',
+        ),
+        migrations.RenameField(
+            model_name='groupmembership',
+            old_name='flags',
+            new_name='roles',
+        ),
+        migrations.AlterUniqueTogether(
+            name='groupmembership',
+            unique_together=set([('user', 'group')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='groupmembership',
+            index_together=set([('group', 'roles'), ('user', 'roles')]),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 08:25
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+# Rows per statement, which keeps SQLite under its parameter limit
+BATCH_SIZE = 500
+
+
+def merge_sponsorships(apps, schema_editor):
+    """Merge duplicate sponsorships, keeping any verification."""
+
+    ClubGroupRequestSponsorship = apps.get_model("groups", "ClubGroupRequestSponsorship")
+    kept = {}
+    merged = []
+    verified = set()
+    for id, request, sponsor, is_verified in (
+            ClubGroupRequestSponsorship.objects
+            .order_by("id")
+            .values_list("id", "request_id", "sponsor_id", "verified")):
+        key = (request, sponsor)
+        if key in kept:
+            merged.append(id)
+        else:
+            kept[key] = id
+        if is_verified:
+            verified.add(kept[key])
+
+    verified = list(verified)
+    for i in range(0, len(merged), BATCH_SIZE):
+        ClubGroupRequestSponsorship.objects.filter(pk__in=merged[i:i+BATCH_SIZE]).delete()
+    for i in range(0, len(verified), BATCH_SIZE):
+        ClubGroupRequestSponsorship.objects.filter(pk__in=verified[i:i+BATCH_SIZE]).update(verified=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('groups', '0003_membership_roles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clubgrouprequest',
+            name='creation_time',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='clubgrouprequest',
+            name='modification_time',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='clubgrouprequest',
+            name='name',
+            field=models.CharField(default='', max_length=80),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='clubgrouprequest',
+            name='title',
+            field=models.CharField(default='', max_length=80),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='clubgrouprequest',
+            name='description',
+            field=models.TextField(default=''),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='clubgrouprequest',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], db_index=True, default='pending', max_length=10),
+        ),
+        migrations.RunPython(merge_sponsorships, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='clubgrouprequestsponsorship',
+            unique_together=set([('request', 'sponsor')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='clubgrouprequestsponsorship',
+            index_together=set([('sponsor', 'verified')]),
+        ),
+    ]
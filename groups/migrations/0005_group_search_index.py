@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 08:25
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class RunPostgreSQL(migrations.RunSQL):
+    """Run SQL only when migrating a PostgreSQL database."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        """Run the forward SQL on PostgreSQL."""
+
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        """Run the reverse SQL on PostgreSQL."""
+
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0004_club_request_review'),
+    ]
+
+    # Databases migrated before this migration may already have the index
+    operations = [
+        RunPostgreSQL(
+            "CREATE INDEX IF NOT EXISTS groups_group_search ON groups_group "
+            "USING gin ((to_tsvector('simple', name || ' ' || title || ' ' || description)))",
+            "DROP INDEX IF EXISTS groups_group_search"),
+    ]
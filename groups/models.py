@@ -1,16 +1,119 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 from polymorphic.models import PolymorphicModel
+from polymorphic.managers import PolymorphicManager
+from polymorphic.query import PolymorphicQuerySet
 
 from core.models import User
 from lib.models import TimeTrackingModel
+from lib.polymorphic import typed
+
+
+# Full text document searched by the group directory on PostgreSQL,
+# which has to match the expression of the index made by migration 0005
+SEARCH_DOCUMENT = "to_tsvector('simple', name || ' ' || title || ' ' || description)"
 
 
 class GroupMembership(TimeTrackingModel):
-    """Represents group membership with added functionality."""
+    """Represents group membership with added functionality.
+
+    Roles are stored as a bit field. Checking for a role is done with
+    an IN over every combination of roles that includes it, which can
+    use the (user, roles) and (group, roles) indexes unlike a bitwise
+    AND in the query.
+    """
+
+    # Enumerated role flags
+    MEMBER = 1
+    OFFICER = 2
+    LEADER = 4
+    SPONSOR = 8
+    ROLES = {"member": MEMBER, "officer": OFFICER, "leader": LEADER, "sponsor": SPONSOR}
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     group = models.ForeignKey("groups.Group", on_delete=models.CASCADE)
-    roles = models.CharField(max_length=30)
+    roles = models.PositiveSmallIntegerField(default=MEMBER)
+
+    class Meta:
+        unique_together = (("user", "group"),)
+        index_together = (("user", "roles"), ("group", "roles"))
+
+    @staticmethod
+    def flag(role) -> int:
+        """Convert a role name or role flags to flags.
+
+        Raises ValueError for an unknown role name or invalid flags.
+        """
+
+        if isinstance(role, str):
+            try:
+                return GroupMembership.ROLES[role.lower()]
+            except KeyError:
+                raise ValueError(f"Unknown role {role!r}, expected one of {', '.join(GroupMembership.ROLES)}")
+        if isinstance(role, int) and 0 < role < 2 ** len(GroupMembership.ROLES):
+            return role
+        raise ValueError(f"Invalid role flags {role!r}")
+
+    @staticmethod
+    def masks(role) -> list:
+        """Return every roles value that includes a role."""
+
+        role = GroupMembership.flag(role)
+        return [mask for mask in range(1, 2 ** len(GroupMembership.ROLES)) if mask & role == role]
+
+    @staticmethod
+    def parse(roles) -> int:
+        """Convert a space or comma separated list of role names to flags."""
+
+        flags = 0
+        for name in roles.replace(",", " ").split():
+            flags |= GroupMembership.flag(name)
+        return flags or GroupMembership.MEMBER
+
+    def has_role(self, role) -> bool:
+        """Check if the member has a role."""
+
+        role = GroupMembership.flag(role)
+        return self.roles & role == role
+
+    @staticmethod
+    def names(roles) -> list:
+        """Convert role flags to a list of role names."""
+
+        return [name for name, flag in sorted(GroupMembership.ROLES.items(), key=lambda item: item[1]) if roles & flag]
+
+    @property
+    def role_names(self) -> list:
+        """Get the names of the member's roles."""
+
+        return GroupMembership.names(self.roles)
+
+
+class GroupQuerySet(PolymorphicQuerySet):
+    """Queries for groups by membership."""
+
+    def for_user(self, user, role=None):
+        """Get the groups a user is a member of, optionally with a role.
+
+        Groups are returned as typed base instances in a single query,
+        each with the user's membership roles in membership_roles.
+        """
+
+        lookup = {"groupmembership__user": user}
+        if role is not None:
+            lookup["groupmembership__roles__in"] = GroupMembership.masks(role)
+        return typed(self.filter(**lookup).annotate(membership_roles=models.F("groupmembership__roles")))
+
+    def with_member_count(self):
+        """Annotate each group with its number of members."""
+
+        counts = (GroupMembership.objects
+                  .filter(group=models.OuterRef("pk"))
+                  .order_by()
+                  .values("group")
+                  .annotate(count=models.Count("pk"))
+                  .values("count"))
+        return self.annotate(member_count=Coalesce(models.Subquery(counts, output_field=models.IntegerField()), 0))
 
 
 class Group(PolymorphicModel, TimeTrackingModel):
@@ -41,6 +144,8 @@ class Group(PolymorphicModel, TimeTrackingModel):
             return cls
         return _register
 
+    objects = PolymorphicManager.from_queryset(GroupQuerySet)()
+
     # Actual group fields
     name = models.CharField(max_length=80, unique=True)
     users = models.ManyToManyField(User, through=GroupMembership, related_name="organizations")
@@ -57,6 +162,7 @@ class Group(PolymorphicModel, TimeTrackingModel):
         permissions = (
             ("manage_groups", "Can manage groups"),
             ("request_group", "Can submit group application"),)
+        index_together = (("hidden", "name"), ("polymorphic_ctype", "hidden", "name"))
 
     def __repr__(self):
         """Represent the group as a string."""
@@ -74,6 +180,13 @@ class Group(PolymorphicModel, TimeTrackingModel):
 
         return f"/groups/{self.id}"
 
+    def members_with_role(self, role):
+        """Get the members with a role and their profiles in one query."""
+
+        return User.objects.with_profile().filter(
+            groupmembership__group=self,
+            groupmembership__roles__in=GroupMembership.masks(role))
+
 
 @Group.register(Group.CLUB)
 class ClubGroup(Group):
@@ -87,14 +200,67 @@ class ClubGroup(Group):
     sponsors = models.ManyToManyField(User)
 
 
-class ClubGroupRequest(models.Model):
+class ClubGroupRequestQuerySet(models.QuerySet):
+    """Queries for the club request review queue."""
+
+    def with_sponsor_counts(self):
+        """Annotate requests with their total and verified sponsor counts."""
+
+        return self.annotate(
+            sponsor_count=models.Count("clubgrouprequestsponsorship"),
+            verified_count=Coalesce(models.Sum(models.Case(
+                models.When(clubgrouprequestsponsorship__verified=True, then=1),
+                default=0,
+                output_field=models.IntegerField())), 0))
+
+    def pending(self):
+        """Get requests that have not been approved or rejected."""
+
+        return self.filter(status=ClubGroupRequest.PENDING)
+
+    def awaiting(self, sponsor):
+        """Get pending requests the sponsor has not verified yet."""
+
+        return self.pending().filter(id__in=ClubGroupRequestSponsorship.objects
+                                     .filter(sponsor=sponsor, verified=False)
+                                     .values("request_id"))
+
+    def ready(self):
+        """Get pending requests whose sponsors have all verified."""
+
+        return (self.pending()
+                .with_sponsor_counts()
+                .filter(sponsor_count__gt=0, verified_count=models.F("sponsor_count")))
+
+
+class ClubGroupRequest(TimeTrackingModel):
     """Student request to create a club group."""
 
     model = ClubGroup
 
+    # Review status
+    PENDING = "pending"
+    APPROVED = "approved"
+    REJECTED = "rejected"
+    STATUSES = ((PENDING, "Pending"), (APPROVED, "Approved"), (REJECTED, "Rejected"))
+
+    objects = ClubGroupRequestQuerySet.as_manager()
+
     user = models.ForeignKey(User, related_name="+")
     sponsors = models.ManyToManyField(User, through="groups.ClubGroupRequestSponsorship", related_name="+")
 
+    # Proposed group
+    name = models.CharField(max_length=80)
+    title = models.CharField(max_length=80)
+    description = models.TextField()
+
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING, db_index=True)
+
+    def __str__(self):
+        """Represent the request as a string."""
+
+        return f"{self.title} ({self.status})"
+
 
 class ClubGroupRequestSponsorship(models.Model):
     """Many to many connector to allow sponsors to verify sponsorship."""
@@ -103,6 +269,10 @@ class ClubGroupRequestSponsorship(models.Model):
     sponsor = models.ForeignKey(User, on_delete=models.CASCADE)
     verified = models.BooleanField(default=False)
 
+    class Meta:
+        unique_together = (("request", "sponsor"),)
+        index_together = (("sponsor", "verified"),)
+
 
 @Group.register(Group.ACADEMIC)
 class AcademicGroup(Group):
@@ -0,0 +1,73 @@
+"""Bulk review of club group requests.
+
+Sponsors verify the requests they were named on, and club
+administrators approve or reject requests once every sponsor has
+verified. Each action works on any number of requests with a fixed
+number of queries, so a whole queue can be cleared in one submission.
+"""
+
+import collections
+
+from django.db import transaction
+
+from lib.polymorphic import bulk_create_polymorphic
+from .models import Group, ClubGroup, ClubGroupRequest, ClubGroupRequestSponsorship, GroupMembership
+
+
+def verify(sponsor, request_ids) -> int:
+    """Verify the sponsor's sponsorship of pending requests."""
+
+    return (ClubGroupRequestSponsorship.objects
+            .filter(sponsor=sponsor, verified=False, request_id__in=request_ids,
+                    request__status=ClubGroupRequest.PENDING)
+            .update(verified=True))
+
+
+def reject(request_ids) -> int:
+    """Reject pending requests."""
+
+    return ClubGroupRequest.objects.pending().filter(id__in=request_ids).update(status=ClubGroupRequest.REJECTED)
+
+
+def approve(request_ids) -> list:
+    """Create club groups for the ready requests among request_ids.
+
+    Requests whose sponsors have not all verified, or whose name is
+    already taken, are left pending. The requester becomes the leader
+    of the new group and each sponsor is added as a sponsor. Returns
+    the groups that were created.
+    """
+
+    with transaction.atomic():
+        requests = {}
+        for request in ClubGroupRequest.objects.ready().filter(id__in=request_ids).order_by("id"):
+            requests.setdefault(request.name, request)
+        taken = set(Group.objects.non_polymorphic().filter(name__in=list(requests)).values_list("name", flat=True))
+        requests = {request.id: request for name, request in requests.items() if name not in taken}
+        if not requests:
+            return []
+
+        sponsors = collections.defaultdict(list)
+        for request_id, sponsor_id in (ClubGroupRequestSponsorship.objects
+                                       .filter(request_id__in=list(requests))
+                                       .values_list("request_id", "sponsor_id")):
+            sponsors[request_id].append(sponsor_id)
+
+        groups = bulk_create_polymorphic(ClubGroup, [
+            ClubGroup(name=request.name, title=request.title, description=request.description, hidden=False)
+            for request in requests.values()], key="name")
+
+        links = []
+        memberships = []
+        for request, group in zip(requests.values(), groups):
+            roles = {request.user_id: GroupMembership.MEMBER | GroupMembership.LEADER}
+            for sponsor_id in sponsors[request.id]:
+                links.append(ClubGroup.sponsors.through(clubgroup_id=group.pk, user_id=sponsor_id))
+                roles[sponsor_id] = roles.get(sponsor_id, 0) | GroupMembership.SPONSOR
+            memberships.extend(
+                GroupMembership(user_id=user_id, group_id=group.pk, roles=flags) for user_id, flags in roles.items())
+        ClubGroup.sponsors.through.objects.bulk_create(links)
+        GroupMembership.objects.bulk_create(memberships)
+
+        ClubGroupRequest.objects.filter(id__in=list(requests)).update(status=ClubGroupRequest.APPROVED)
+    return groups
@@ -5,5 +5,6 @@ from . import views
 urls = [
     url("^$", views.Index.as_view(), name="index"),
     url("^list/$", views.List.as_view(), name="list"),
+    url("^requests/$", views.Requests.as_view(), name="requests"),
     url("^create/(?P<typeof>\w+)?$", views.Create.as_view(), name="create"),
 ]
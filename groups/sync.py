@@ -0,0 +1,118 @@
+"""Bulk synchronization of group memberships from section rosters.
+
+Academic groups mirror class sections whose rosters change daily. Rather
+than adding and removing members one at a time, the desired membership
+of each group in the export is compared against the current memberships
+in memory, and the difference is applied with bulk inserts, deletes of
+the members leaving each changed group, and one update per distinct set
+of roles, all batched inside a single transaction. Groups that do not
+appear in the export are left untouched.
+"""
+
+import collections
+
+from django.db import connection, transaction
+
+from core.models import User
+from .models import Group, GroupMembership
+
+
+# Keeps IN clauses under SQLite's bound parameter limit
+LOOKUP_BATCH_SIZE = 500
+
+
+def batched(values, size=LOOKUP_BATCH_SIZE):
+    """Split a collection of values into lists of at most size."""
+
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def lookup(queryset, field, values) -> dict:
+    """Map values of a unique field to primary keys in batches."""
+
+    ids = {}
+    for batch in batched(values):
+        ids.update(queryset.filter(**{f"{field}__in": batch}).values_list(field, "pk"))
+    return ids
+
+
+def desired_memberships(records) -> dict:
+    """Group records by group name into a map of username to roles."""
+
+    desired = collections.defaultdict(dict)
+    for record in records:
+        group = record["group"].strip()
+        username = record["username"].strip()
+        if not group or not username:
+            continue
+        desired[group][username] = GroupMembership.parse(record.get("roles") or "")
+    return desired
+
+
+def current_memberships(group_ids) -> dict:
+    """Load existing memberships as a map of group ID to user ID to membership ID and roles."""
+
+    current = collections.defaultdict(dict)
+    for batch in batched(group_ids):
+        for pk, group_id, user_id, roles in (GroupMembership.objects
+                                             .filter(group_id__in=batch)
+                                             .values_list("pk", "group_id", "user_id", "roles")):
+            current[group_id][user_id] = (pk, roles)
+    return current
+
+
+def sync_memberships(records, dry_run=False):
+    """Make the memberships of every group in records match exactly.
+
+    Records need group and username fields and may have a roles field of
+    space or comma separated role names. Unknown groups and usernames
+    are skipped and counted. Returns a counter of created, deleted,
+    updated, and unchanged memberships.
+    """
+
+    desired = desired_memberships(records)
+    group_ids = lookup(Group.objects.non_polymorphic(), "name", desired)
+    user_ids = lookup(User.objects, "username", {username for members in desired.values() for username in members})
+
+    counts = collections.Counter(created=0, deleted=0, updated=0, unchanged=0)
+    counts["missing_groups"] = len(desired.keys() - group_ids.keys())
+    counts["missing_users"] = len({username for members in desired.values() for username in members} - user_ids.keys())
+
+    with transaction.atomic():
+        current = current_memberships(group_ids.values())
+        create = []
+        delete = {}
+        update = collections.defaultdict(list)
+        for name, group_id in group_ids.items():
+            wanted = {user_ids[username]: roles for username, roles in desired[name].items() if username in user_ids}
+            existing = current[group_id]
+            for user_id, roles in wanted.items():
+                if user_id not in existing:
+                    create.append(GroupMembership(group_id=group_id, user_id=user_id, roles=roles))
+                elif existing[user_id][1] != roles:
+                    update[roles].append(existing[user_id][0])
+                else:
+                    counts["unchanged"] += 1
+            removed = existing.keys() - wanted.keys()
+            if removed:
+                delete[group_id] = list(removed)
+                counts["deleted"] += len(removed)
+        counts["created"] = len(create)
+        counts["updated"] = sum(map(len, update.values()))
+        if dry_run:
+            return counts
+
+        # Inserts are cut down to fit the database's parameter limit
+        fields = GroupMembership._meta.concrete_fields
+        size = min(LOOKUP_BATCH_SIZE, connection.ops.bulk_batch_size(fields, create) or 1)
+        GroupMembership.objects.bulk_create(create, batch_size=size)
+        for group_id, removed in delete.items():
+            for batch in batched(removed):
+                GroupMembership.objects.filter(group_id=group_id, user_id__in=batch).delete()
+        for roles, pks in update.items():
+            for batch in batched(pks):
+                GroupMembership.objects.filter(pk__in=batch).update(roles=roles)
+
+    return counts
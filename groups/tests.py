@@ -1,3 +1,294 @@
-from django.test import TestCase
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
 
-# Create your tests here.
+from django.contrib.auth.models import Permission
+
+from core.models import User
+from groups import directory, sync, review
+from groups.models import Group, GroupMembership, ClubGroup, ClubGroupRequest, ClubGroupRequestSponsorship
+
+
+class DirectoryTest(TestCase):
+    """Check filtering and keyset pagination of the group directory."""
+
+    def setUp(self):
+        """Create groups of a couple of types."""
+
+        for i in range(5):
+            Group.concrete[Group.CLUB](name=f"club{i}", title=f"Club {i}", description="Chess", hidden=i == 4).save()
+        for i in range(3):
+            Group.concrete[Group.ACADEMIC](name=f"class{i}", title=f"Class {i}", description="Math", hidden=False).save()
+
+    def test_pages(self):
+        """Pages follow each other without gaps or repeats."""
+
+        names = []
+        cursor = None
+        with self.assertNumQueries(3):
+            while True:
+                page = directory.directory(cursor=cursor, size=3)
+                names.extend(group.name for group in page.groups)
+                cursor = page.next
+                if cursor is None:
+                    break
+        self.assertEqual(names, ["class0", "class1", "class2", "club0", "club1", "club2", "club3"])
+
+    def test_filters(self):
+        """Groups are filtered by type, hidden flag, and search."""
+
+        page = directory.directory(type=Group.CLUB, hidden=None)
+        self.assertEqual(len(page.groups), 5)
+        self.assertTrue(all(group.type == Group.CLUB for group in page.groups))
+        page = directory.directory(query="math")
+        self.assertEqual([group.name for group in page.groups], ["class0", "class1", "class2"])
+
+
+class MembershipTest(TestCase):
+    """Check role queries on group memberships."""
+
+    def setUp(self):
+        """Create a couple of members with different roles."""
+
+        self.club = Group.concrete[Group.CLUB](name="club", title="Club", description="", hidden=False)
+        self.club.save()
+        self.other = Group.concrete[Group.ACADEMIC](name="class", title="Class", description="", hidden=False)
+        self.other.save()
+        self.officer = User.objects.create_user(username="officer", type="student", profile__student_id="1")
+        self.member = User.objects.create_user(username="member", type="student", profile__student_id="2")
+        GroupMembership.objects.create(
+            user=self.officer, group=self.club, roles=GroupMembership.MEMBER | GroupMembership.OFFICER)
+        GroupMembership.objects.create(user=self.officer, group=self.other)
+        GroupMembership.objects.create(user=self.member, group=self.club)
+
+    def test_roles(self):
+        """Role names round trip through the bit field."""
+
+        self.assertEqual(GroupMembership.parse("Officer, member"), GroupMembership.MEMBER | GroupMembership.OFFICER)
+        membership = GroupMembership.objects.get(user=self.officer, group=self.club)
+        self.assertTrue(membership.has_role("officer"))
+        self.assertFalse(membership.has_role("leader"))
+        self.assertEqual(sorted(membership.role_names), ["member", "officer"])
+
+    def test_unknown_role(self):
+        """Unknown role names are rejected with a ValueError."""
+
+        with self.assertRaisesRegex(ValueError, "Unknown role 'treasurer'"):
+            GroupMembership.masks("treasurer")
+        with self.assertRaises(ValueError):
+            GroupMembership.parse("member treasurer")
+        with self.assertRaises(ValueError):
+            GroupMembership.masks(16)
+        with self.assertRaises(ValueError):
+            self.club.members_with_role(None)
+
+    def test_for_user(self):
+        """Groups for a user come back typed in one query each."""
+
+        list(Group.objects.for_user(self.officer))
+        with self.assertNumQueries(2):
+            groups = {group.name: group for group in Group.objects.for_user(self.officer)}
+            officer = [group.name for group in Group.objects.for_user(self.officer, role="officer")]
+        self.assertEqual(groups["class"].type, Group.ACADEMIC)
+        self.assertEqual(groups["club"].membership_roles, GroupMembership.MEMBER | GroupMembership.OFFICER)
+        self.assertEqual(officer, ["club"])
+
+    def test_members_with_role(self):
+        """Members with a role are found with their profiles."""
+
+        self.assertEqual(list(self.club.members_with_role("member").order_by("username")), [self.member, self.officer])
+        with self.assertNumQueries(1):
+            officers = list(self.club.members_with_role(GroupMembership.OFFICER))
+            self.assertEqual(officers[0].profile.student_id, "1")
+
+
+class MembershipMigrationTest(TransactionTestCase):
+    """Check the conversion of free text roles to flags."""
+
+    before = [("groups", "0002_group_directory_index")]
+    after = [("groups", "0003_membership_roles")]
+
+    def migrate(self, targets):
+        """Migrate to targets and return the historical apps."""
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        """Leave the schema migrated."""
+
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_convert(self):
+        """Roles become flags and duplicate memberships are merged."""
+
+        officer = User.objects.create_user(username="officer", type="student", profile__student_id="1")
+        member = User.objects.create_user(username="member", type="student", profile__student_id="2")
+
+        apps = self.migrate(self.before)
+        club = apps.get_model("groups", "Group").objects.create(name="club", title="Club", description="", hidden=False)
+        Membership = apps.get_model("groups", "GroupMembership")
+        oldest = Membership.objects.create(user_id=officer.pk, group=club, roles="Member")
+        Membership.objects.create(user_id=officer.pk, group=club, roles="officer, treasurer")
+        plain = Membership.objects.create(user_id=member.pk, group=club, roles="")
+
+        Membership = self.migrate(self.after).get_model("groups", "GroupMembership")
+        self.assertEqual(set(Membership.objects.values_list("id", "user_id", "roles")), {
+            (oldest.pk, officer.pk, GroupMembership.MEMBER | GroupMembership.OFFICER),
+            (plain.pk, member.pk, GroupMembership.MEMBER)})
+
+
+class IndexQueryTest(TestCase):
+    """Check that the membership dashboard does not query per group."""
+
+    def setUp(self):
+        """Create a student in thirty groups of mixed types."""
+
+        self.user = User.objects.create_user(username="student", type="student", profile__student_id="1")
+        other = User.objects.create_user(username="other", type="student", profile__student_id="2")
+        for i in range(30):
+            group = Group.concrete[(Group.CLUB, Group.ACADEMIC)[i % 2]](
+                name=f"group{i:02}", title=f"Group {i}", description="", hidden=False)
+            group.save()
+            GroupMembership.objects.create(user=self.user, group=group, roles=GroupMembership.MEMBER | i % 3 * 2)
+            if i % 5 == 0:
+                GroupMembership.objects.create(user=other, group=group)
+
+    def test_index(self):
+        """The dashboard takes the same number of queries for any number of groups."""
+
+        self.client.force_login(self.user)
+        self.client.get(reverse("groups:index"))
+        # Session, user, then groups with roles and member counts
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("groups:index"))
+        groups = response.context["groups"]
+        self.assertEqual(len(groups), 30)
+        self.assertEqual(groups[0].type, Group.CLUB)
+        self.assertEqual(groups[0].member_count, 2)
+        self.assertEqual(groups[1].member_count, 1)
+        self.assertEqual(groups[2].roles, ["member", "leader"])
+
+
+class SyncTest(TestCase):
+    """Check that membership sync applies the difference in bulk."""
+
+    def setUp(self):
+        """Create two sections and some students."""
+
+        self.users = [User.objects.create_user(username=f"student{i}", type="student", profile__student_id=str(i))
+                      for i in range(6)]
+        for name in ("section1", "section2"):
+            Group.concrete[Group.ACADEMIC](name=name, title=name, description="", hidden=False).save()
+        self.section1 = Group.objects.get(name="section1")
+        for user in self.users[:3]:
+            GroupMembership.objects.create(user=user, group=self.section1)
+
+    def members(self, group):
+        """Get the usernames and roles of a group's members."""
+
+        return dict(GroupMembership.objects.filter(group__name=group).values_list("user__username", "roles"))
+
+    def test_sync(self):
+        """Members are added, removed, and updated to match the records."""
+
+        records = [
+            {"group": "section1", "username": "student1", "roles": "member officer"},
+            {"group": "section1", "username": "student2"},
+            {"group": "section1", "username": "student3"},
+            {"group": "section2", "username": "student4"},
+            {"group": "section2", "username": "nobody"},
+            {"group": "missing", "username": "student5"}]
+        counts = sync.sync_memberships(records)
+        self.assertEqual(self.members("section1"), {
+            "student1": GroupMembership.MEMBER | GroupMembership.OFFICER,
+            "student2": GroupMembership.MEMBER,
+            "student3": GroupMembership.MEMBER})
+        self.assertEqual(self.members("section2"), {"student4": GroupMembership.MEMBER})
+        self.assertEqual(
+            (counts["created"], counts["deleted"], counts["updated"], counts["unchanged"]), (2, 1, 1, 1))
+        self.assertEqual((counts["missing_groups"], counts["missing_users"]), (1, 1))
+
+        # Running the same records again only reads, plus the savepoint
+        with self.assertNumQueries(5):
+            counts = sync.sync_memberships(records[:4])
+        self.assertEqual(counts["unchanged"], 4)
+
+    def test_large_roster(self):
+        """Rosters over the batch size are added and removed in batches."""
+
+        User.objects.bulk_create(User(username=f"large{i}") for i in range(1100))
+        records = [{"group": "section2", "username": f"large{i}"} for i in range(1100)]
+        self.assertEqual(sync.sync_memberships(records)["created"], 1100)
+        self.assertEqual(sync.sync_memberships(records[:1])["deleted"], 1099)
+        self.assertEqual(self.members("section2"), {"large0": GroupMembership.MEMBER})
+
+
+class ReviewTest(TestCase):
+    """Check that the club request queue works in bulk."""
+
+    def setUp(self):
+        """Create requests each with two sponsors."""
+
+        self.student = User.objects.create_user(username="student", type="student", profile__student_id="1")
+        self.sponsors = [User.objects.create_user(username=f"teacher{i}", type="teacher") for i in range(2)]
+        self.admin = User.objects.create_user(username="admin", type="staff")
+        self.admin.user_permissions.add(Permission.objects.get(codename="manage_groups"))
+        self.requests = []
+        for i in range(50):
+            club = ClubGroupRequest.objects.create(
+                user=self.student, name=f"club{i}", title=f"Club {i}", description="Fun")
+            for sponsor in self.sponsors:
+                ClubGroupRequestSponsorship.objects.create(request=club, sponsor=sponsor)
+            self.requests.append(club)
+        self.ids = [str(club.id) for club in self.requests]
+
+    def test_verify(self):
+        """Sponsors verify many requests with one query."""
+
+        with self.assertNumQueries(1):
+            self.assertEqual(review.verify(self.sponsors[0], [club.id for club in self.requests[:10]]), 10)
+        self.assertEqual(ClubGroupRequest.objects.awaiting(self.sponsors[0]).count(), 40)
+        self.assertEqual(ClubGroupRequest.objects.ready().count(), 0)
+
+    def test_queue_queries(self):
+        """The queue page takes the same number of queries for any number of requests."""
+
+        self.client.force_login(self.sponsors[0])
+        self.client.get(reverse("groups:requests"))
+        # Session, user, permissions, awaiting requests with counts
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("groups:requests"))
+        self.assertEqual(len(response.context["awaiting"]), 50)
+        self.assertEqual(response.context["awaiting"][0].verified_count, 0)
+        self.assertEqual(response.context["awaiting"][0].sponsor_count, 2)
+
+    def test_approve(self):
+        """An administrator approves fifty ready requests in one post."""
+
+        for sponsor in self.sponsors:
+            review.verify(sponsor, [club.id for club in self.requests])
+        Group.concrete[Group.CLUB](name="club0", title="Taken", description="", hidden=False).save()
+        self.client.force_login(self.admin)
+        # Session, user, permissions, then a fixed set of reads and bulk writes in a savepoint
+        with self.assertNumQueries(15):
+            response = self.client.post(reverse("groups:requests"), {"action": "approve", "requests": self.ids})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ClubGroupRequest.objects.filter(status=ClubGroupRequest.APPROVED).count(), 49)
+        club = ClubGroup.objects.get(name="club1")
+        self.assertEqual(set(club.sponsors.all()), set(self.sponsors))
+        membership = GroupMembership.objects.get(group=club, user=self.student)
+        self.assertTrue(membership.has_role("leader"))
+        self.assertEqual(len(club.members_with_role("sponsor")), 2)
+
+    def test_reject_requires_permission(self):
+        """Only group managers may approve or reject requests."""
+
+        self.client.force_login(self.sponsors[0])
+        response = self.client.post(reverse("groups:requests"), {"action": "reject", "requests": self.ids})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(review.reject([club.id for club in self.requests[:5]]), 5)
+        self.assertEqual(ClubGroupRequest.objects.pending().count(), 45)
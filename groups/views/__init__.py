@@ -1,13 +1,13 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import View
-from django.shortcuts import render
-from django.http import Http404
+from django.shortcuts import render, redirect
+from django.http import Http404, HttpResponseForbidden
 
 from lib.views import ProfileBasedViewDispatcher
 
 from core.models import UserProfile
-from groups.models import Group
-from groups import forms
+from groups.models import Group, ClubGroupRequest
+from groups import forms, review
 
 from . import student
 
@@ -43,3 +43,32 @@ class Create(LoginRequiredMixin, View):
 
         if request.user.has_perm("create_group"):
             return render(request, "groups/create/create.html", {"form": forms.create[typeof]})
+
+
+class Requests(LoginRequiredMixin, View):
+    """Review queue for club group requests."""
+
+    def get(self, request, *args, **kwargs):
+        """Show requests awaiting the user's verification or approval."""
+
+        requests = ClubGroupRequest.objects.select_related("user").order_by("creation_time")
+        manager = request.user.has_perm("groups.manage_groups")
+        return render(request, "groups/requests.html", {
+            "awaiting": requests.awaiting(request.user).with_sponsor_counts(),
+            "ready": requests.ready() if manager else None})
+
+    def post(self, request, *args, **kwargs):
+        """Verify, approve, or reject the selected requests."""
+
+        action = request.POST.get("action")
+        ids = [int(id) for id in request.POST.getlist("requests") if id.isdigit()]
+        if action == "verify":
+            review.verify(request.user, ids)
+        elif action in ("approve", "reject"):
+            if not request.user.has_perm("groups.manage_groups"):
+                return HttpResponseForbidden()
+            if action == "approve":
+                review.approve(ids)
+            else:
+                review.reject(ids)
+        return redirect("groups:requests")
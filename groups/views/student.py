@@ -1,21 +1,33 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.views.generic import ListView, FormView
+from django.views.generic import View
 
 from groups import models
+from groups import directory
 
 
 @login_required
 def index(request):
     """View the index groups page."""
 
-    return render(request, "groups/student/index.html", {"groups": request.user.groups.all()})
+    groups = list(models.Group.objects.for_user(request.user).with_member_count().order_by("name"))
+    for group in groups:
+        group.roles = models.GroupMembership.names(group.membership_roles)
+    return render(request, "groups/student/index.html", {"groups": groups})
 
 
-class List(ListView):
-    """View the list of available groups."""
+class List(View):
+    """View the directory of available groups."""
 
-    model = models.Group
-    template_name = "groups/list.html"
-    context_object_name = "groups"
-    paginate_by = 25
+    def get(self, request, *args, **kwargs):
+        """Get a page of the directory."""
+
+        page = directory.from_params(request.GET, request.user)
+        params = request.GET.copy()
+        params["cursor"] = page.next
+        return render(request, "groups/list.html", {
+            "groups": page.groups,
+            "next": params.urlencode() if page.next else None,
+            "types": sorted(models.Group.concrete),
+            "type": request.GET.get("type", ""),
+            "query": request.GET.get("q", "")})
@@ -0,0 +1,124 @@
+"""Mutual friends and friend suggestions.
+
+Mutual friend counts are precomputed in the MutualFriendCount table
+and updated incrementally by the friendship signal receivers, so the
+profile page only has to read them. The whole table can be rebuilt
+from the friendship graph, which is loaded into memory as compact
+integer arrays per user, for example after friendships are imported.
+The functions that rewrite whole tables take the models to use so that
+migrations can run them with historical models.
+"""
+
+import array
+import collections
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Friendship, MutualFriendCount
+
+
+def mutual_count(a, b) -> int:
+    """Get the number of friends two users have in common."""
+
+    a, b = getattr(a, "pk", a), getattr(b, "pk", b)
+    return (MutualFriendCount.objects
+            .filter(user_id=a, other_id=b)
+            .values_list("count", flat=True)
+            .first()) or 0
+
+
+def suggestions(user, k=5) -> list:
+    """Get the top k people a user may know by mutual friend count.
+
+    Each suggestion is a MutualFriendCount with the suggested user
+    selected as other.
+    """
+
+    return list(
+        MutualFriendCount.objects
+        .filter(user=user)
+        .exclude(other__in=Friendship.friends(user).values("pk"))
+        .select_related("other")
+        .order_by("-count", "other_id")[:k])
+
+
+# Rows per statement, which keeps SQLite under its parameter limit
+BATCH_SIZE = 500
+
+
+def canonicalize(friendships) -> tuple:
+    """Store each pair of users once with the lower user ID first.
+
+    Friendships used to be stored in whichever direction they were
+    requested, sometimes in both. Every pair is merged down to its
+    oldest row, which is confirmed if any of its rows were, and the
+    user in a is kept as the requester before reversed rows are
+    swapped. Returns the number of merged and swapped rows.
+    """
+
+    kept = {}
+    merged = []
+    confirmed = set()
+    with transaction.atomic():
+        for id, a, b, is_confirmed in (
+                friendships.objects
+                .order_by("creation_time", "id")
+                .values_list("id", "a_id", "b_id", "confirmed")):
+            pair = (a, b) if a < b else (b, a)
+            if pair in kept:
+                merged.append(id)
+            else:
+                kept[pair] = id
+            if is_confirmed:
+                confirmed.add(kept[pair])
+
+        confirmed = list(confirmed)
+        for i in range(0, len(merged), BATCH_SIZE):
+            friendships.objects.filter(pk__in=merged[i:i+BATCH_SIZE]).delete()
+        for i in range(0, len(confirmed), BATCH_SIZE):
+            friendships.objects.filter(pk__in=confirmed[i:i+BATCH_SIZE]).update(confirmed=True)
+
+        # Swap reversed rows in one statement
+        friendships.objects.filter(requester__isnull=True).update(requester=F("a"))
+        swapped = friendships.objects.filter(a_id__gt=F("b_id")).update(a=F("b"), b=F("a"))
+    return len(merged), swapped
+
+
+def adjacency(friendships=Friendship) -> dict:
+    """Load the confirmed friendship graph as arrays of user IDs."""
+
+    graph = collections.defaultdict(lambda: array.array("l"))
+    for a, b in friendships.objects.filter(confirmed=True).values_list("a_id", "b_id").iterator():
+        graph[a].append(b)
+        graph[b].append(a)
+    return graph
+
+
+def rebuild(batch_size=1000, friendships=Friendship, counts=MutualFriendCount) -> int:
+    """Recompute every mutual friend count, returning the row count.
+
+    Counts are built one user at a time by walking friends of friends,
+    so memory stays proportional to the graph rather than to the
+    number of pairs.
+    """
+
+    def insert(rows):
+        # Inserts are cut down to fit the database's parameter limit
+        size = min(batch_size, connection.ops.bulk_batch_size(counts._meta.concrete_fields, rows) or 1)
+        counts.objects.bulk_create(rows, batch_size=size)
+
+    graph = adjacency(friendships)
+    rows = []
+    total = 0
+    with transaction.atomic():
+        counts.objects.all().delete()
+        for user, friends in graph.items():
+            mutual = collections.Counter(other for friend in friends for other in graph[friend] if other != user)
+            rows.extend(counts(user_id=user, other_id=other, count=count) for other, count in mutual.items())
+            if len(rows) >= batch_size:
+                insert(rows)
+                total += len(rows)
+                rows = []
+        insert(rows)
+    return total + len(rows)
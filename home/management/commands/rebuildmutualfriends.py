@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from home import friends
+
+
+class Command(BaseCommand):
+    """Recomputes all mutual friend counts."""
+
+    help = """\
+    Mutual friend counts are normally kept up to date as friendships
+    are confirmed and removed. This command recomputes all of them
+    from scratch, which is needed after friendships are changed in
+    bulk without going through the model, e.g. by an import.
+    """
+
+    def handle(self, *args, **kwargs):
+        """Run the actual command."""
+
+        count = friends.rebuild()
+        self.stdout.write(f"Stored {count} mutual friend counts")
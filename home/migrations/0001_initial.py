@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 08:22
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Permissions',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'permissions': (('can_login', 'Can login to home'),),
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Friendship',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creation_time', models.DateTimeField(auto_now_add=True)),
+                ('modification_time', models.DateTimeField(auto_now=True)),
+                ('confirmed', models.BooleanField(default=False)),
+                ('a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.User')),
+                ('b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.User')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 08:23
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def canonicalize(apps, schema_editor):
+    """Merge and reorder existing friendships before adding the constraint."""
+
+    from home import friends
+    friends.canonicalize(apps.get_model("home", "Friendship"))
+
+
+class Migration(migrations.Migration):
+
+    # The data is changed in its own transaction, since PostgreSQL won't
+    # alter a table with foreign key checks still pending from updates
+    dependencies = [
+        ('home', '0002_friendship_requester'),
+    ]
+
+    operations = [
+        migrations.RunPython(canonicalize, migrations.RunPython.noop),
+    ]
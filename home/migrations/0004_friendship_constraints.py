@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 08:23
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('home', '0003_canonicalize_friendships'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='friendship',
+            unique_together=set([('a', 'b')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='friendship',
+            index_together=set([('a', 'confirmed'), ('b', 'confirmed')]),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 08:23
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def rebuild(apps, schema_editor):
+    """Count the mutual friends of existing friendships."""
+
+    from home import friends
+    friends.rebuild(friendships=apps.get_model("home", "Friendship"), counts=apps.get_model("home", "MutualFriendCount"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('home', '0004_friendship_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MutualFriendCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.User')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.User')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='mutualfriendcount',
+            unique_together=set([('user', 'other')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='mutualfriendcount',
+            index_together=set([('user', 'count')]),
+        ),
+        migrations.RunPython(rebuild, migrations.RunPython.noop),
+    ]
@@ -1,32 +1,146 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import Permission, ContentType
 
 from core.models import User
 from groups.models import Group
-from lib.models import TimeTrackingModel
+from lib.models import TimeTrackingModel, DirtyTrackingModel
 
 
-class Friendship(TimeTrackingModel):
-    """A friendship between two users."""
+class Friendship(TimeTrackingModel, DirtyTrackingModel):
+    """A friendship between two users.
+
+    Each pair of users is stored once in canonical order, with the
+    lower user ID in a, so that a pair can be found with a single
+    indexed lookup. The user who asked for the friendship is kept
+    separately in requester.
+    """
 
     a = models.ForeignKey(User, related_name="+")
     b = models.ForeignKey(User, related_name="+")
+    requester = models.ForeignKey(User, related_name="+", blank=True, null=True)
     confirmed = models.BooleanField(default=False)
 
+    class Meta:
+        unique_together = (("a", "b"),)
+        index_together = (("a", "confirmed"), ("b", "confirmed"))
+
+    def save(self, *args, **kwargs):
+        """Store the pair in canonical order before saving."""
+
+        if self.requester_id is None:
+            self.requester_id = self.a_id
+        if self.a_id > self.b_id:
+            self.a_id, self.b_id = self.b_id, self.a_id
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def ordered(a, b) -> tuple:
+        """Return the IDs of two users in canonical order."""
+
+        a, b = getattr(a, "pk", a), getattr(b, "pk", b)
+        return (a, b) if a < b else (b, a)
+
     @staticmethod
     def between(a, b) -> bool:
         """Check if two users are friends."""
 
-        return (Friendship.objects.filter(a=a, b=b, confirmed=True) |
-                Friendship.objects.filter(a=b, b=a, confirmed=True)).first()
+        a, b = Friendship.ordered(a, b)
+        return Friendship.objects.filter(a_id=a, b_id=b, confirmed=True).first()
 
     @staticmethod
     def friends(user, confirmed=True) -> list:
-        """Get all friends of a user."""
+        """Get all friends of a user in a single query."""
+
+        return User.objects.filter(
+            models.Q(pk__in=Friendship.objects.filter(a=user, confirmed=confirmed).values("b")) |
+            models.Q(pk__in=Friendship.objects.filter(b=user, confirmed=confirmed).values("a")))
+
+
+class MutualFriendCount(models.Model):
+    """The number of friends two users have in common.
+
+    Counts are stored in both directions so that the mutual friends of
+    a user can be read with one indexed query, and are kept up to date
+    incrementally as friendships are confirmed and removed. Pairs with
+    no mutual friends have no row.
+    """
+
+    user = models.ForeignKey(User, related_name="+", on_delete=models.CASCADE)
+    other = models.ForeignKey(User, related_name="+", on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = (("user", "other"),)
+        index_together = (("user", "count"),)
+
+    @staticmethod
+    def adjust(user, others, delta):
+        """Change the count between a user and others in both directions.
+
+        Rows that a concurrent confirmation created after they were
+        found missing are added to rather than created again.
+        """
+
+        if not others:
+            return
+
+        counts = MutualFriendCount.objects
+        with transaction.atomic():
+            existing = set(counts.filter(user=user, other__in=others).values_list("other_id", flat=True))
+            counts.filter(user=user, other__in=existing).update(count=F("count") + delta)
+            counts.filter(user__in=existing, other=user).update(count=F("count") + delta)
+
+            if delta <= 0:
+                counts.filter(user=user, other__in=existing, count__lte=0).delete()
+                counts.filter(user__in=existing, other=user, count__lte=0).delete()
+                return
+
+            missing = [other for other in others if other not in existing]
+            try:
+                with transaction.atomic():
+                    counts.bulk_create(
+                        [MutualFriendCount(user_id=user, other_id=other, count=delta) for other in missing] +
+                        [MutualFriendCount(user_id=other, other_id=user, count=delta) for other in missing])
+            except IntegrityError:
+                for other in missing:
+                    for a, b in ((user, other), (other, user)):
+                        if not counts.filter(user=a, other=b).update(count=F("count") + delta):
+                            counts.create(user_id=a, other_id=b, count=delta)
+
+    @staticmethod
+    def update(a, b, delta):
+        """Account for a friendship between a and b being added or removed.
+
+        Every other friend of a gains or loses b as a mutual friend, and
+        the other way around.
+        """
+
+        friends_of_a = set(Friendship.friends(a).exclude(pk=b).values_list("pk", flat=True))
+        friends_of_b = set(Friendship.friends(b).exclude(pk=a).values_list("pk", flat=True))
+        MutualFriendCount.adjust(b, friends_of_a, delta)
+        MutualFriendCount.adjust(a, friends_of_b, delta)
+
+
+@receiver(post_save, sender=Friendship)
+def on_save_friendship(sender, instance, created, **kwargs):
+    """Update mutual friend counts when a friendship is confirmed."""
+
+    was_confirmed = not created and getattr(instance, "_loaded_values", {}).get("confirmed", False)
+    if instance.confirmed and not was_confirmed:
+        MutualFriendCount.update(instance.a_id, instance.b_id, 1)
+    elif was_confirmed and not instance.confirmed:
+        MutualFriendCount.update(instance.a_id, instance.b_id, -1)
+
+
+@receiver(post_delete, sender=Friendship)
+def on_delete_friendship(sender, instance, **kwargs):
+    """Update mutual friend counts when a friendship is removed."""
 
-        ids = (set(Friendship.objects.filter(a=user, confirmed=confirmed).values_list("b", flat=True)) |
-               set(Friendship.objects.filter(b=user, confirmed=confirmed).values_list("a", flat=True)))
-        return User.objects.filter(pk__in=ids)
+    if instance.confirmed:
+        MutualFriendCount.update(instance.a_id, instance.b_id, -1)
 
 
 class Permissions(models.Model):
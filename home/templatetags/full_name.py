@@ -1,5 +1,7 @@
 from django import template
 
+from core import snapshots
+
 register = template.Library()
 
 
@@ -7,4 +9,5 @@ register = template.Library()
 def full_name(value):
     """Return the full name of a user."""
 
-    return value.profile.full_name
+    snapshot = snapshots.get(value)
+    return snapshot.full_name if snapshot else value.get_full_name()
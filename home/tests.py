@@ -1,3 +1,184 @@
-from django.test import TestCase
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from core.models import User, UserProfile
+from core import snapshots
+from home.models import Friendship, MutualFriendCount
+from home import friends
+
+
+class IndexQueryTest(TestCase):
+    """Check the number of queries it takes to render the index."""
+
+    def setUp(self):
+        """Create and log in a student."""
+
+        snapshots.cache().clear()
+        self.user = User.objects.create_user(
+            username="student",
+            first_name="Sean",
+            last_name="Gabaree",
+            type=UserProfile.STUDENT,
+            profile__student_id="123456")
+        self.client.force_login(self.user)
+
+    def test_index_queries(self):
+        """The user and concrete profile are loaded in one query."""
+
+        # Session, then user joined with profile
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("home:index"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.wsgi_request.user.profile, UserProfile.concrete[UserProfile.STUDENT])
+
+    def test_index_snapshot_queries(self):
+        """Once the snapshot is cached, profile tables aren't queried."""
+
+        self.client.get(reverse("home:index"))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse("home:index"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(context), 2)
+        self.assertFalse(any("core_userprofile" in query["sql"] for query in context))
+
+
+class FriendshipTest(TestCase):
+    """Check that friendships are stored once per pair."""
+
+    def setUp(self):
+        """Create a handful of users."""
+
+        self.users = [User.objects.create_user(username=f"user{i}", type=UserProfile.TEACHER) for i in range(4)]
+
+    def test_canonical(self):
+        """Pairs are stored lower ID first, keeping the requester."""
+
+        friendship = Friendship.objects.create(a=self.users[2], b=self.users[0])
+        self.assertEqual((friendship.a_id, friendship.b_id), (self.users[0].pk, self.users[2].pk))
+        self.assertEqual(friendship.requester_id, self.users[2].pk)
+
+    def test_between(self):
+        """A confirmed friendship is found in either order."""
+
+        friendship = Friendship.objects.create(a=self.users[1], b=self.users[0])
+        self.assertIsNone(Friendship.between(self.users[0], self.users[1]))
+        friendship.confirmed = True
+        friendship.save()
+        self.assertEqual(Friendship.between(self.users[0], self.users[1]), friendship)
+        self.assertEqual(Friendship.between(self.users[1].pk, self.users[0].pk), friendship)
+        self.assertIsNone(Friendship.between(self.users[0], self.users[2]))
+
+    def test_friends(self):
+        """Friends are found on both sides of the pair in one query."""
+
+        Friendship.objects.create(a=self.users[1], b=self.users[0], confirmed=True)
+        Friendship.objects.create(a=self.users[1], b=self.users[2], confirmed=True)
+        Friendship.objects.create(a=self.users[3], b=self.users[1])
+        with self.assertNumQueries(1):
+            confirmed = set(Friendship.friends(self.users[1]))
+        self.assertEqual(confirmed, {self.users[0], self.users[2]})
+        self.assertEqual(set(Friendship.friends(self.users[1], confirmed=False)), {self.users[3]})
+        self.assertEqual(set(Friendship.friends(self.users[3])), set())
+
+
+class FriendshipMigrationTest(TransactionTestCase):
+    """Check the conversion of friendships stored in either direction."""
+
+    before = [("home", "0001_initial")]
+    after = [("home", "0005_mutualfriendcount")]
+
+    def migrate(self, targets):
+        """Migrate to targets and return the historical apps."""
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        """Leave the schema migrated."""
+
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_convert(self):
+        """Duplicate and reversed pairs are merged and reordered."""
+
+        users = [User.objects.create_user(username=f"user{i}", type=UserProfile.TEACHER) for i in range(4)]
+        a, b, c, d = (user.pk for user in users)
+
+        Friendship = self.migrate(self.before).get_model("home", "Friendship")
+        oldest = Friendship.objects.create(a_id=b, b_id=a)
+        Friendship.objects.create(a_id=a, b_id=b, confirmed=True)
+        Friendship.objects.create(a_id=c, b_id=b, confirmed=True)
+        Friendship.objects.create(a_id=a, b_id=c, confirmed=True)
+        Friendship.objects.create(a_id=a, b_id=d)
+
+        apps = self.migrate(self.after)
+        Friendship = apps.get_model("home", "Friendship")
+        rows = set(Friendship.objects.values_list("id", "a_id", "b_id", "requester_id", "confirmed"))
+        self.assertEqual(len(rows), 4)
+        self.assertIn((oldest.pk, a, b, b, True), rows)
+        self.assertIn((a, c), {(row[1], row[2]) for row in rows})
+        self.assertIn((b, c, c, True), {row[1:] for row in rows})
+        self.assertIn((a, d, a, False), {row[1:] for row in rows})
+
+        # Mutual friends of the converted pairs are counted
+        MutualFriendCount = apps.get_model("home", "MutualFriendCount")
+        counts = {(row.user_id, row.other_id): row.count for row in MutualFriendCount.objects.all()}
+        self.assertEqual(counts[(a, b)], 1)
+        self.assertEqual(counts[(b, c)], 1)
+
+
+class MutualFriendTest(TestCase):
+    """Check that incremental mutual friend counts match a rebuild."""
+
+    def setUp(self):
+        """Create a handful of users."""
+
+        self.users = [User.objects.create_user(username=f"user{i}", type=UserProfile.TEACHER) for i in range(5)]
+
+    def befriend(self, a, b):
+        """Request and confirm a friendship."""
+
+        friendship = Friendship(a=self.users[a], b=self.users[b])
+        friendship.save()
+        friendship.confirmed = True
+        friendship.save()
+        return friendship
+
+    def counts(self):
+        """Return the stored counts as a dictionary."""
+
+        return {(c.user_id, c.other_id): c.count for c in MutualFriendCount.objects.all()}
+
+    def test_incremental(self):
+        """Confirming and removing friendships keeps counts correct."""
+
+        self.befriend(0, 1)
+        self.befriend(0, 2)
+        self.befriend(3, 1)
+        self.befriend(3, 2)
+        removed = self.befriend(4, 0)
+        self.befriend(4, 1)
+        removed.delete()
+
+        self.assertEqual(friends.mutual_count(self.users[0], self.users[3]), 2)
+        self.assertEqual(friends.mutual_count(self.users[0], self.users[4]), 1)
+        suggested = friends.suggestions(self.users[0])
+        self.assertEqual([s.other for s in suggested], [self.users[3], self.users[4]])
+
+        incremental = self.counts()
+        friends.rebuild()
+        self.assertEqual(incremental, self.counts())
+
+    def test_conflicting_rows(self):
+        """Counts a concurrent confirmation created are added to."""
+
+        self.befriend(0, 1)
+        MutualFriendCount.objects.create(user=self.users[1], other=self.users[2], count=1)
+        self.befriend(0, 2)
+        b, c = self.users[1].pk, self.users[2].pk
+        self.assertEqual(self.counts(), {(b, c): 2, (c, b): 1})
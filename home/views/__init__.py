@@ -1,6 +1,7 @@
 from django.contrib import auth
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import render, redirect, HttpResponse
+from django.utils.http import is_safe_url
 from django.views.generic import View
 
 from lib.views import ProfileBasedViewDispatcher
@@ -15,7 +16,7 @@ class LoginView(View):
     def get(self, request, *args, **kwargs):
         """Get the static HTML page."""
 
-        return render(request, "home/login.html")
+        return render(request, "home/login.html", {"next": request.GET.get("next", "")})
 
     def post(self, request, *args, **kwargs):
         """Post login data to the server."""
@@ -40,6 +41,10 @@ class LoginView(View):
 
         auth.login(request, user)
 
+        # Continue to the page that required login, such as an OpenID authorization
+        destination = request.POST.get("next", "")
+        if destination and is_safe_url(destination, allowed_hosts={request.get_host()}):
+            return redirect(destination)
         return redirect("home:index")
 
 
@@ -2,6 +2,7 @@ from django.shortcuts import render, redirect, HttpResponse
 from django.contrib.auth.models import Permission
 
 from core import models
+from home import friends
 
 
 def index(request, *args, **kwargs):
@@ -13,4 +14,4 @@ def index(request, *args, **kwargs):
 def profile(request, *args, **kwargs):
     """View the student profile."""
 
-    return render(request, "home/student/profile.html")
+    return render(request, "home/student/profile.html", {"suggestions": friends.suggestions(request.user)})
@@ -2,6 +2,8 @@
 
 from django.http import Http404
 
+from core import snapshots
+
 
 def profile_type(*types):
     """Require specific profile types to access a view."""
@@ -12,7 +14,8 @@ def profile_type(*types):
         def view_wrapper(request, *args, **kwargs):
             """View that requires profile type to be in specified."""
 
-            if request.user and request.user.profile and request.user.profile.type in types:
+            snapshot = snapshots.get(request.user)
+            if snapshot and snapshot.type in types:
                 return view(request, *args, **kwargs)
             else:
                 raise Http404()
@@ -9,3 +9,54 @@ class TimeTrackingModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class DirtyTrackingModel(models.Model):
+    """Tracks which fields have changed since loading or saving."""
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Remember the values the instance was loaded with."""
+
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, update_fields=None, **kwargs):
+        """Save and remember the values that were written."""
+
+        super().save(*args, update_fields=update_fields, **kwargs)
+        current = {field.attname: getattr(self, field.attname) for field in self._meta.concrete_fields}
+        if update_fields is None or not hasattr(self, "_loaded_values"):
+            self._loaded_values = current
+        else:
+            names = set(update_fields)
+            fields = (f for f in self._meta.concrete_fields if f.name in names or f.attname in names)
+            self._loaded_values.update((f.attname, current[f.attname]) for f in fields)
+
+    def get_dirty_fields(self):
+        """Return the attribute names of fields that have changed."""
+
+        loaded = getattr(self, "_loaded_values", {})
+        return [name for name, value in loaded.items() if getattr(self, name) != value]
+
+    def save_dirty(self):
+        """Save only the changed fields, returning whether anything was written.
+
+        Instances that were never loaded or saved are saved in full.
+        Fields with auto_now are written along with any change.
+        """
+
+        if self.pk is None or not hasattr(self, "_loaded_values"):
+            self.save()
+            return True
+
+        dirty = self.get_dirty_fields()
+        if not dirty:
+            return False
+        automatic = [f.attname for f in self._meta.concrete_fields if getattr(f, "auto_now", False)]
+        self.save(update_fields=set(dirty + automatic))
+        return True
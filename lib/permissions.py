@@ -1,5 +1,6 @@
 from groups.models import Group
 from core.models import User, UserProfile
+from core import snapshots
 
 
 def allowed_groups(user: User):
@@ -7,8 +8,12 @@ def allowed_groups(user: User):
 
     if user.is_superuser or user.is_staff:
         return [Group.CLUB, Group.ACADEMIC, Group.EXTERNAL, Group.ADMINISTRATIVE]
-    elif user.profile.type in (UserProfile.TEACHER, UserProfile.STAFF):
+
+    snapshot = snapshots.get(user)
+    if snapshot is None:
+        return []
+    elif snapshot.type in (UserProfile.TEACHER, UserProfile.STAFF):
         return [Group.CLUB, Group.ACADEMIC, Group.EXTERNAL]
-    elif user.profile.type in (UserProfile.STUDENT,):
+    elif snapshot.type in (UserProfile.STUDENT,):
         return [Group.CLUB]
     return []
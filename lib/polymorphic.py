@@ -0,0 +1,137 @@
+"""Helpers for working with polymorphic models in bulk.
+
+Django refuses to bulk create multi-table inherited models because it
+cannot get primary keys back from a bulk insert into the parent table
+on most databases. Since every polymorphic child has a unique natural
+key somewhere in its parent table, we can insert the parent rows in
+bulk, look their keys up again in a single query, and then insert the
+child rows in bulk.
+"""
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, router, transaction
+from django.db.models.query import ModelIterable
+
+
+def bulk_create_polymorphic(model, objs, key, batch_size=None):
+    """Bulk create instances of a single polymorphic child model.
+
+    The key names a unique field on the parent model that is used to
+    recover parent primary keys after the insert. Objects are returned
+    with their primary keys set.
+    """
+
+    objs = list(objs)
+    if not objs:
+        return objs
+
+    parent = model._meta.pk.remote_field.model
+    using = router.db_for_write(model)
+    connection = connections[using]
+    ctype = ContentType.objects.db_manager(using).get_for_model(model, for_concrete_model=False)
+
+    for obj in objs:
+        obj.polymorphic_ctype_id = ctype.id
+
+    parent_fields = [f for f in parent._meta.concrete_fields if not f.primary_key]
+    parents = [parent(**{f.attname: getattr(obj, f.attname) for f in parent_fields}) for obj in objs]
+
+    with transaction.atomic(using=using, savepoint=False):
+        parent._base_manager.using(using).bulk_create(parents, batch_size=batch_size)
+
+        # Only PostgreSQL hands primary keys back from a bulk insert
+        if any(p.pk is None for p in parents):
+            lookup = dict(
+                parent._base_manager.using(using)
+                .filter(**{f"{key}__in": [getattr(p, key) for p in parents]})
+                .values_list(key, "pk"))
+            for p in parents:
+                p.pk = lookup[getattr(p, key)]
+
+        for obj, p in zip(objs, parents):
+            obj.pk = p.pk
+            for f in parent_fields:
+                setattr(obj, f.attname, getattr(p, f.attname))
+
+        fields = model._meta.local_concrete_fields
+        size = batch_size or connection.ops.bulk_batch_size(fields, objs) or len(objs)
+        for i in range(0, len(objs), size):
+            model._base_manager.using(using)._insert(objs[i:i+size], fields=fields, using=using)
+
+    for obj in objs:
+        obj._state.adding = False
+        obj._state.db = using
+    return objs
+
+
+def child_links(model):
+    """Return the reverse parent links from a model to its children."""
+
+    return [rel for rel in model._meta.related_objects if rel.parent_link]
+
+
+def select_children(path, model):
+    """Return select_related paths that join every child of a model."""
+
+    return [f"{path}__{rel.get_accessor_name()}" for rel in child_links(model)]
+
+
+def downcast(instance):
+    """Return the concrete child of a non-polymorphic instance.
+
+    When the child tables were joined with select_children, this uses
+    the cached child and doesn't query the database. The cache is read
+    directly because polymorphic replaces the child accessors with ones
+    that always query.
+    """
+
+    model = ContentType.objects.get_for_id(instance.polymorphic_ctype_id).model_class()
+    if model is None or isinstance(instance, model):
+        return instance
+    for rel in child_links(type(instance)):
+        if issubclass(model, rel.related_model):
+            child = getattr(instance, rel.get_cache_name(), None)
+            if child is None:
+                child = rel.related_model._base_manager.get(pk=instance.pk)
+
+            # Saving checks cached relations through polymorphic's parent
+            # accessor, which would query for the parent again
+            child.__dict__.pop(rel.field.get_cache_name(), None)
+            return downcast(child)
+    return instance
+
+
+def content_type_ids(registry) -> dict:
+    """Map a registry of types to classes to content type IDs.
+
+    This lets the type of a non-polymorphic instance be read off of its
+    polymorphic_ctype_id without downcasting it. Content types that
+    aren't cached yet are fetched together in one query.
+    """
+
+    ctypes = ContentType.objects.get_for_models(*registry.values(), for_concrete_models=False)
+    return {type: ctypes[cls].id for type, cls in registry.items()}
+
+
+class TypedIterable(ModelIterable):
+    """Yields base instances with their registered type set.
+
+    The model of the queryset must have a concrete registry of types
+    to classes, like user profiles and groups do.
+    """
+
+    def __iter__(self):
+        """Set the type of each instance from its content type."""
+
+        names = {id: type for type, id in content_type_ids(self.queryset.model.concrete).items()}
+        for instance in super().__iter__():
+            instance.type = names.get(instance.polymorphic_ctype_id)
+            yield instance
+
+
+def typed(queryset):
+    """Make a polymorphic queryset yield typed base instances."""
+
+    queryset = queryset.non_polymorphic()
+    queryset._iterable_class = TypedIterable
+    return queryset
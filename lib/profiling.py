@@ -0,0 +1,235 @@
+"""Opt-in per request profiling.
+
+The middleware here profiles a request when PROFILING_ENABLED is set,
+when a fraction PROFILING_SAMPLE_RATE of requests is sampled, or when
+a staff user (or anyone while DEBUG is on) sends the PROFILING_HEADER
+header. For a profiled request it records every query with its time,
+counts queries that were run more than once with the same parameters,
+and times template rendering and the view as a whole. The results are
+sent back in a Server-Timing header, which browser developer tools
+show next to the request, and logged as a JSON line. If
+PROFILING_DIRECTORY is set, a cProfile dump of each profiled request is
+written there for pstats or snakeviz.
+
+Requests that aren't profiled only pay for a couple of attribute checks.
+Query timing is switched on per connection for the duration of a
+profiled request rather than patched into every cursor.
+"""
+
+import cProfile
+import collections
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends import utils
+from django.template.base import Template
+
+
+logger = logging.getLogger(__name__)
+
+# The recorder of the request being profiled on each thread
+local = threading.local()
+
+
+class Recorder:
+    """Collects queries and template timings for a single request."""
+
+    def __init__(self):
+        """Start with nothing recorded."""
+
+        self.queries = []
+        self.template = 0.0
+        self.depth = 0
+
+    def query(self, alias, sql, params, elapsed):
+        """Record a query and how long it took in seconds."""
+
+        self.queries.append((alias, sql, repr(params), elapsed))
+
+    @property
+    def sql(self) -> float:
+        """Get the total time spent in queries in seconds."""
+
+        return sum(query[3] for query in self.queries)
+
+    def duplicates(self) -> dict:
+        """Get the queries that ran more than once with how often they ran."""
+
+        counts = collections.Counter((alias, sql, params) for alias, sql, params, _ in self.queries)
+        return {key: count for key, count in counts.items() if count > 1}
+
+
+class ProfilingCursorWrapper(utils.CursorDebugWrapper):
+    """Cursor that reports each query to the request recorder."""
+
+    def __init__(self, cursor, db, recorder):
+        """Wrap a cursor for a recorder."""
+
+        super().__init__(cursor, db)
+        self.recorder = recorder
+
+    def execute(self, sql, params=None):
+        """Time a query."""
+
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            self.recorder.query(self.db.alias, sql, params, time.perf_counter() - start)
+
+    def executemany(self, sql, param_list):
+        """Time a batch of queries."""
+
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, param_list)
+        finally:
+            self.recorder.query(self.db.alias, sql, param_list, time.perf_counter() - start)
+
+
+def timed_render(render):
+    """Wrap Template._render to time the outermost template of a request."""
+
+    def wrapper(self, context):
+        recorder = getattr(local, "recorder", None)
+        if recorder is None:
+            return render(self, context)
+        recorder.depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            recorder.depth -= 1
+            if recorder.depth == 0:
+                recorder.template += time.perf_counter() - start
+
+    wrapper.profiled = True
+    return wrapper
+
+
+def install():
+    """Time template rendering, once per process."""
+
+    if not getattr(Template._render, "profiled", False):
+        Template._render = timed_render(Template._render)
+
+
+class recording:
+    """Record queries on every connection of this thread."""
+
+    def __init__(self, recorder):
+        """Record into a recorder."""
+
+        self.recorder = recorder
+        self.saved = []
+
+    def __enter__(self):
+        """Switch connections to profiling cursors."""
+
+        self.previous = getattr(local, "recorder", None)
+        local.recorder = self.recorder
+        for connection in connections.all():
+            self.saved.append((connection, connection.force_debug_cursor, connection.__dict__.get("make_debug_cursor")))
+            connection.force_debug_cursor = True
+            connection.make_debug_cursor = (
+                lambda cursor, connection=connection: ProfilingCursorWrapper(cursor, connection, self.recorder))
+        return self.recorder
+
+    def __exit__(self, *exc_info):
+        """Restore connections, including any recording this one was nested in."""
+
+        for connection, force_debug_cursor, make_debug_cursor in self.saved:
+            connection.force_debug_cursor = force_debug_cursor
+            if make_debug_cursor is None:
+                del connection.make_debug_cursor
+            else:
+                connection.make_debug_cursor = make_debug_cursor
+        self.saved = []
+        local.recorder = self.previous
+
+
+def server_timing(recorder, total) -> str:
+    """Format timings in seconds as a Server-Timing header."""
+
+    duplicates = sum(count - 1 for count in recorder.duplicates().values())
+    return ", ".join((
+        f'sql;dur={recorder.sql * 1000:.2f};desc="{len(recorder.queries)} queries, {duplicates} duplicate"',
+        f"template;dur={recorder.template * 1000:.2f}",
+        f"view;dur={total * 1000:.2f}"))
+
+
+class ProfilingMiddleware:
+    """Profiles opted in requests and reports where their time went."""
+
+    def __init__(self, get_response):
+        """Read profiling settings once."""
+
+        self.get_response = get_response
+        self.always = getattr(settings, "PROFILING_ENABLED", False)
+        self.rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+        self.header = "HTTP_" + getattr(settings, "PROFILING_HEADER", "X-Profile").upper().replace("-", "_")
+        self.directory = getattr(settings, "PROFILING_DIRECTORY", None)
+        install()
+
+    def enabled(self, request) -> bool:
+        """Check whether to profile a request."""
+
+        if self.always:
+            return True
+        if self.header in request.META:
+            user = getattr(request, "user", None)
+            return settings.DEBUG or (user is not None and user.is_staff)
+        return self.rate > 0 and random.random() < self.rate
+
+    def __call__(self, request):
+        """Profile the request if it opted in."""
+
+        if not self.enabled(request):
+            return self.get_response(request)
+
+        profile = cProfile.Profile() if self.directory else None
+        with recording(Recorder()) as recorder:
+            start = time.perf_counter()
+            if profile is not None:
+                profile.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profile is not None:
+                    profile.disable()
+            total = time.perf_counter() - start
+
+        path = None
+        if profile is not None:
+            path = self.dump(profile, request)
+        response["Server-Timing"] = server_timing(recorder, total)
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "view_ms": round(total * 1000, 2),
+            "sql_ms": round(recorder.sql * 1000, 2),
+            "queries": len(recorder.queries),
+            "duplicates": [
+                {"sql": sql, "count": count}
+                for (alias, sql, params), count in sorted(recorder.duplicates().items(), key=lambda item: -item[1])],
+            "template_ms": round(recorder.template * 1000, 2),
+            "profile": path}))
+        return response
+
+    def dump(self, profile, request) -> str:
+        """Write a profile to the profiling directory, returning its path."""
+
+        os.makedirs(self.directory, exist_ok=True)
+        name = re.sub(r"[^\w]+", "-", request.path).strip("-") or "index"
+        stamp = f"{time.time():.6f}".replace(".", "")
+        path = os.path.join(self.directory, f"{stamp}-{threading.get_ident()}-{request.method}-{name}.prof")
+        profile.dump_stats(path)
+        return path
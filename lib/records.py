@@ -0,0 +1,33 @@
+"""Readers for the flat record files exported by the school."""
+
+import csv
+import json
+import os
+import string
+
+
+def printable(handle):
+    """Generator that filters non-printable characters while reading."""
+
+    for line in handle:
+        yield "".join(filter(lambda x: x in string.printable, line))
+
+
+def read_records(path):
+    """Yield dictionaries from a CSV file with a header or a JSONL file.
+
+    The format is chosen by file extension. Column names in CSV files
+    are lowercased and stripped so exports with untidy headers work.
+    """
+
+    _, extension = os.path.splitext(path)
+    with open(path) as file:
+        if extension.lower() in (".jsonl", ".ndjson"):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            reader = csv.reader(printable(file))
+            header = [column.strip().lower() for column in next(reader)]
+            for line in reader:
+                yield dict(zip(header, line))
@@ -0,0 +1,242 @@
+"""Detection of N+1 queries in tests.
+
+An N+1 query is the same statement run over and over with different
+parameters, usually because a related object, or the concrete class of
+a polymorphic profile or group, is loaded inside a loop in a view,
+template, serializer, or admin column. The tools here record the
+queries of a block, group them by the shape of their SQL with literals
+and parameter lists collapsed, and report every shape that ran at least
+threshold times along with the Python stack that ran it first.
+
+Use watch around a block, NPlusOneMixin on a test case to watch every
+request its client makes, or NPlusOneTestRunner as the TEST_RUNNER to
+watch every test client request in the suite.
+
+Caches that have to be shared between worker processes can be checked
+with run_worker, which runs code in a separate process, inside
+shared_caches, which moves them to a temporary file based cache.
+"""
+
+import collections
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import traceback
+import warnings
+
+from django.conf import settings
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .profiling import Recorder, recording
+
+
+# Frames from these files are left out of reported stacks
+INTERNAL = (os.path.abspath(__file__), os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiling.py"))
+
+LOCMEM_BACKEND = "django.core.cache.backends.locmem.LocMemCache"
+FILE_BACKEND = "django.core.cache.backends.filebased.FileBasedCache"
+
+
+class NPlusOneError(AssertionError):
+    """Raised when a watched block runs N+1 queries."""
+
+
+class NPlusOneWarning(UserWarning):
+    """Warned when a watched block runs N+1 queries and shouldn't raise."""
+
+
+def shape(sql) -> str:
+    """Reduce SQL to its structure by collapsing literals and lists."""
+
+    sql = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    sql = re.sub(r"\b\d+(?:\.\d+)?\b", "?", sql)
+    sql = sql.replace("%s", "?")
+    sql = re.sub(r"\(\s*\?(?:\s*,\s*\?)*\s*\)", "(...)", sql)
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def stack() -> list:
+    """Get the frames of the current stack that belong to this project."""
+
+    frames = []
+    for frame in traceback.extract_stack()[:-1]:
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(settings.BASE_DIR) and "site-packages" not in filename and filename not in INTERNAL:
+            frames.append(frame)
+    return frames
+
+
+class Detector(Recorder):
+    """Records queries with the stack that ran them."""
+
+    def __init__(self, threshold=3):
+        """Flag shapes that run at least threshold times."""
+
+        super().__init__()
+        self.threshold = threshold
+        self.stacks = {}
+
+    def query(self, alias, sql, params, elapsed):
+        """Record a query and where the first of its shape came from."""
+
+        super().query(alias, sql, params, elapsed)
+        key = (alias, shape(sql))
+        if key not in self.stacks:
+            self.stacks[key] = stack()
+
+    def problems(self) -> list:
+        """Get each repeated shape with its count and first stack."""
+
+        counts = collections.Counter((alias, shape(sql)) for alias, sql, _, _ in self.queries)
+        return [(key[1], count, self.stacks[key]) for key, count in counts.most_common() if count >= self.threshold]
+
+    def report(self) -> str:
+        """Describe every repeated shape for a test failure."""
+
+        lines = []
+        for sql, count, frames in self.problems():
+            lines.append(f"{count} queries of the same shape: {sql}")
+            lines.extend(f"  {line}" for line in "".join(traceback.format_list(frames[-6:])).splitlines())
+        return "\n".join(lines)
+
+
+class watch:
+    """Flag N+1 queries run inside a block.
+
+    With strict set, leaving the block raises NPlusOneError if any
+    query shape ran at least threshold times; otherwise a warning is
+    issued. The detector is available as the target of the with.
+    """
+
+    def __init__(self, threshold=None, strict=None):
+        """Configure the watch, defaulting to the NPLUSONE settings."""
+
+        self.threshold = threshold if threshold is not None else getattr(settings, "NPLUSONE_THRESHOLD", 3)
+        self.strict = strict if strict is not None else getattr(settings, "NPLUSONE_RAISE", True)
+        self.detector = None
+        self.recording = None
+
+    def __enter__(self):
+        """Start recording queries."""
+
+        self.detector = Detector(self.threshold)
+        self.recording = recording(self.detector)
+        return self.recording.__enter__()
+
+    def __exit__(self, kind, value, tb):
+        """Stop recording and flag repeated shapes."""
+
+        self.recording.__exit__(kind, value, tb)
+        if kind is not None or not self.detector.problems():
+            return
+        report = self.detector.report()
+        if self.strict:
+            raise NPlusOneError(report)
+        warnings.warn(report, NPlusOneWarning, stacklevel=2)
+
+
+def watched(request):
+    """Wrap a test client request method to run inside a watch."""
+
+    def wrapper(self, **kwargs):
+        with watch():
+            return request(self, **kwargs)
+    return wrapper
+
+
+class NPlusOneClient(Client):
+    """Test client that watches every request for N+1 queries."""
+
+    request = watched(Client.request)
+
+
+class NPlusOneMixin:
+    """Test case mixin that watches requests made with self.client."""
+
+    client_class = NPlusOneClient
+
+
+def local_caches() -> dict:
+    """Get the cache settings with every cache moved to local memory."""
+
+    return {alias: dict(config, BACKEND=LOCMEM_BACKEND, LOCATION=alias) for alias, config in settings.CACHES.items()}
+
+
+class NPlusOneTestRunner(DiscoverRunner):
+    """Test runner that watches every test client request in the suite.
+
+    Every cache is kept in local memory while the suite runs, so tests
+    never read or clear a shared cache configured for the deployment,
+    and the warning about unshared caches is silenced.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        """Make the test client watch its requests and use local caches."""
+
+        super().setup_test_environment(**kwargs)
+        self.request = Client.request
+        Client.request = watched(Client.request)
+        self.caches = override_settings(
+            CACHES=local_caches(), SILENCED_SYSTEM_CHECKS=[*settings.SILENCED_SYSTEM_CHECKS, "api.W001"])
+        self.caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        """Restore the test client and caches."""
+
+        self.caches.disable()
+        Client.request = self.request
+        super().teardown_test_environment(**kwargs)
+
+
+class shared_caches:
+    """Move caches to a temporary file based cache inside a block.
+
+    Worker processes see the same caches if they are run with the
+    environment that is the target of the with.
+    """
+
+    def __init__(self, *aliases):
+        """Configure which caches are shared."""
+
+        self.aliases = aliases
+        self.directory = None
+        self.override = None
+
+    def __enter__(self):
+        """Create the cache directory and switch the caches to it."""
+
+        self.directory = tempfile.TemporaryDirectory()
+        caches = dict(settings.CACHES)
+        for alias in self.aliases:
+            caches[alias] = dict(
+                caches[alias], BACKEND=FILE_BACKEND, LOCATION=os.path.join(self.directory.name, alias))
+        self.override = override_settings(CACHES=caches)
+        self.override.enable()
+        return {"ANDURIL_CACHE_BACKEND": FILE_BACKEND, "ANDURIL_CACHE_LOCATION": self.directory.name}
+
+    def __exit__(self, kind, value, tb):
+        """Restore the caches and remove the directory."""
+
+        self.override.disable()
+        self.directory.cleanup()
+
+
+def run_worker(source, env=None) -> str:
+    """Run source in a separate Django process and return what it printed.
+
+    The process uses the same settings module but not the test
+    database, so it should only touch shared resources like caches.
+    Extra environment variables such as those from shared_caches are
+    passed with env.
+    """
+
+    env = dict(os.environ, **env or {})
+    env.setdefault("DJANGO_SETTINGS_MODULE", "anduril.settings")
+    result = subprocess.run(
+        [sys.executable, "-c", f"import django\ndjango.setup()\n{source}"],
+        env=env, cwd=settings.BASE_DIR, stdout=subprocess.PIPE, check=True, universal_newlines=True)
+    return result.stdout.strip()
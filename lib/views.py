@@ -1,18 +1,21 @@
 from django.views.generic import View
 from django.shortcuts import HttpResponse
 
+from core import snapshots
+
 
 class ProfileBasedViewDispatcher(View):
     """Returns responses based on the request user type."""
 
     lookup = {}
-    default = HttpResponse(status=404)
+    default = staticmethod(lambda request, *args, **kwargs: HttpResponse(status=404))
 
     def dispatch(self, request, *args, **kwargs):
         """Return the response according to the lookup."""
 
-        if not request.user.profile:
+        snapshot = snapshots.get(request.user)
+        if not snapshot:
             print("User does not have an attached profile!")
             return HttpResponse(status=500)
 
-        return self.lookup.get(request.user.profile.type, self.default)(request, *args, **kwargs)
+        return self.lookup.get(snapshot.type, self.default)(request, *args, **kwargs)
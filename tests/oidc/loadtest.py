@@ -0,0 +1,295 @@
+"""Load test of the OpenID Connect login flow on localhost.
+
+This creates a throwaway database (SQLite or PostgreSQL, whichever the
+settings use), seeds it with students and an OpenID client, and serves
+Anduril from a thread. Simulated relying parties then log in
+concurrently, each going through authorize, the login page, login,
+the authorization redirect, token, and userinfo. Latency percentiles and
+the number of queries per step are printed at the end, and optionally
+written as JSON so runs can be compared.
+
+    python tests/oidc/loadtest.py -n 500 -c 16
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import io
+import json
+import math
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "anduril.settings")
+
+import django
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.servers.basehttp import WSGIServer
+from django.db import connection
+from django.db.backends import utils
+from django.test.testcases import LiveServerThread, QuietWSGIRequestHandler
+from oidc_provider.models import Client
+import requests
+
+from core.models import UserProfile
+from core.roster import import_roster
+
+
+CLIENT_ID = "loadtest"
+CLIENT_SECRET = "loadtest"
+REDIRECT_URI = "http://localhost:5000/"
+PASSWORD = "password"
+STEPS = ("authorize", "login_page", "login", "authorization", "token", "userinfo")
+
+
+# Queries are counted per request thread and returned in a header
+counter = threading.local()
+
+
+def counted(execute):
+    """Wrap a cursor method to count the queries it runs."""
+
+    def wrapper(self, *args, **kwargs):
+        counter.queries = getattr(counter, "queries", 0) + 1
+        return execute(self, *args, **kwargs)
+    return wrapper
+
+
+utils.CursorWrapper.execute = counted(utils.CursorWrapper.execute)
+utils.CursorWrapper.executemany = counted(utils.CursorWrapper.executemany)
+
+
+class QueryCountingHandler:
+    """WSGI middleware that reports the queries each request ran."""
+
+    def __init__(self, application):
+        """Wrap an application."""
+
+        self.application = application
+
+    def __call__(self, environ, start_response):
+        """Count queries while the response is being produced."""
+
+        counter.queries = 0
+
+        def counting_start_response(status, headers, exc_info=None):
+            return start_response(status, headers + [("X-Query-Count", str(counter.queries))], exc_info)
+
+        return self.application(environ, counting_start_response)
+
+
+class ThreadedWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    """WSGI server that handles each request in a thread."""
+
+    daemon_threads = True
+
+
+class ServerThread(LiveServerThread):
+    """Live server that handles requests concurrently."""
+
+    def _create_server(self, port):
+        """Create a threaded server."""
+
+        return ThreadedWSGIServer((self.host, port), QuietWSGIRequestHandler, allow_reuse_address=False)
+
+
+def create_database(path=None):
+    """Create and migrate a throwaway database.
+
+    SQLite test databases are in memory by default, which can't be
+    shared with the server's request threads, so a file is used.
+    """
+
+    database = settings.DATABASES["default"]
+    if database["ENGINE"].endswith("sqlite3"):
+        database.setdefault("TEST", {})["NAME"] = path or os.path.join(tempfile.mkdtemp(), "loadtest.sqlite3")
+        database.setdefault("OPTIONS", {})["timeout"] = 30
+    return connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+
+def seed(users):
+    """Create students that can log in and the OpenID client."""
+
+    password = make_password(PASSWORD)
+    import_roster({
+        "username": f"loadtest{i}",
+        "type": UserProfile.STUDENT,
+        "first_name": "Load",
+        "last_name": f"Test {i}",
+        "password": password,
+        "profile__student_id": str(900000 + i)} for i in range(users))
+    Client.objects.create(
+        name="Load test",
+        client_id=CLIENT_ID,
+        client_secret=CLIENT_SECRET,
+        response_type="code",
+        _redirect_uris=REDIRECT_URI,
+        require_consent=False)
+    call_command("creatersakey", stdout=io.StringIO())
+
+
+def login(base, username):
+    """Log in through the relying party flow, timing each step."""
+
+    timings = []
+    session = requests.Session()
+
+    def step(name, method, url, **kwargs):
+        start = time.perf_counter()
+        response = session.request(method, url, allow_redirects=False, **kwargs)
+        elapsed = time.perf_counter() - start
+        timings.append((name, elapsed, int(response.headers.get("X-Query-Count", 0))))
+        if response.status_code >= 400:
+            raise RuntimeError(f"{name} returned {response.status_code}")
+        return response
+
+    state = os.urandom(8).hex()
+    authorize = step("authorize", "GET", f"{base}/openid/authorize/", params={
+        "client_id": CLIENT_ID,
+        "redirect_uri": REDIRECT_URI,
+        "response_type": "code",
+        "scope": "openid profile email id",
+        "state": state})
+    login_url = urllib.parse.urljoin(base, authorize.headers["Location"])
+    step("login_page", "GET", login_url)
+    next_url = urllib.parse.parse_qs(urllib.parse.urlparse(login_url).query)["next"][0]
+    logged_in = step("login", "POST", f"{base}/login/", data={
+        "username": username,
+        "password": PASSWORD,
+        "next": next_url,
+        "csrfmiddlewaretoken": session.cookies["csrftoken"]})
+    redirect = step("authorization", "GET", urllib.parse.urljoin(base, logged_in.headers["Location"]))
+    query = urllib.parse.parse_qs(urllib.parse.urlparse(redirect.headers["Location"]).query)
+    if query.get("state") != [state] or "code" not in query:
+        raise RuntimeError(f"authorization redirected to {redirect.headers['Location']}")
+    token = step("token", "POST", f"{base}/openid/token/", data={
+        "grant_type": "authorization_code",
+        "code": query["code"][0],
+        "redirect_uri": REDIRECT_URI,
+        "client_id": CLIENT_ID,
+        "client_secret": CLIENT_SECRET}).json()
+    userinfo = step("userinfo", "GET", f"{base}/openid/userinfo/", headers={
+        "Authorization": f"Bearer {token['access_token']}"}).json()
+    if userinfo.get("username") != username:
+        raise RuntimeError(f"userinfo returned {userinfo}")
+    return timings
+
+
+def percentile(values, fraction):
+    """Get a nearest rank percentile of sorted values."""
+
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def summarize(results):
+    """Summarize latencies in milliseconds and queries per step."""
+
+    by_step = collections.defaultdict(list)
+    for timings in results:
+        for name, elapsed, queries in timings:
+            by_step[name].append((elapsed * 1000, queries))
+
+    summary = {}
+    for name in STEPS:
+        samples = by_step.get(name)
+        if not samples:
+            continue
+        latencies = sorted(latency for latency, _ in samples)
+        summary[name] = {
+            "count": len(samples),
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1],
+            "queries": sum(queries for _, queries in samples) / len(samples)}
+    return summary
+
+
+def report(summary, failures, elapsed, logins):
+    """Print the summary as a table."""
+
+    print(f"{'step':<14}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'queries':>9}")
+    for name, row in summary.items():
+        print(f"{name:<14}{row['count']:>7}{row['p50']:>10.1f}{row['p95']:>10.1f}{row['p99']:>10.1f}"
+              f"{row['max']:>10.1f}{row['queries']:>9.1f}")
+    print(f"{logins - len(failures)} of {logins} logins succeeded in {elapsed:.2f}s "
+          f"({(logins - len(failures)) / elapsed:.1f} logins/s)")
+    for error, count in collections.Counter(failures).most_common():
+        print(f"  {count} failed: {error}")
+
+
+def main():
+    """Run the load test."""
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("-n", "--logins", type=int, default=200, help="Number of logins to simulate.")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="Number of concurrent relying parties.")
+    parser.add_argument("-u", "--users", type=int, default=None, help="Number of students to seed.")
+    parser.add_argument("--fast-hasher", action="store_true", help="Hash passwords with MD5 to leave it out.")
+    parser.add_argument("--database", default=None, help="SQLite file to create the database in.")
+    parser.add_argument("--json", default=None, help="File to write the summary to.")
+    args = parser.parse_args()
+
+    if args.fast_hasher:
+        settings.PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+    users = args.users or args.logins
+    settings.ALLOWED_HOSTS = ["localhost"]
+
+    name = connection.settings_dict["NAME"]
+    create_database(args.database)
+    server = None
+    try:
+        seed(users)
+        server = ServerThread("localhost", QueryCountingHandler)
+        server.daemon = True
+        server.start()
+        server.is_ready.wait()
+        if server.error:
+            raise server.error
+        base = f"http://localhost:{server.port}"
+        settings.SITE_URL = base
+
+        # Warm up caches and the server before measuring
+        login(base, "loadtest0")
+
+        failures = []
+        results = []
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(args.concurrency) as executor:
+            futures = [executor.submit(login, base, f"loadtest{i % users}") for i in range(args.logins)]
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as error:
+                    failures.append(str(error))
+        elapsed = time.perf_counter() - start
+
+        summary = summarize(results)
+        report(summary, failures, elapsed, args.logins)
+        if args.json:
+            with open(args.json, "w") as file:
+                json.dump({
+                    "logins": args.logins,
+                    "concurrency": args.concurrency,
+                    "failures": len(failures),
+                    "elapsed": elapsed,
+                    "steps": summary}, file, indent=2)
+    finally:
+        if server is not None:
+            server.terminate()
+        connection.creation.destroy_test_db(name, verbosity=0)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())